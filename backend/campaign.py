@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Distributed campaigns
+#
+# One mutiny instance runs with --serve PORT as the coordinator, leasing
+# out blocks of run numbers to any number of mutiny instances started
+# with --coordinator HOST:PORT, on any machine.  Each worker keeps one TCP
+# connection open for as long as it runs; if it's lost, the blocks the
+# worker hadn't finished are leased out again.  Logs written by workers
+# are also sent to the coordinator, which keeps them in its own folder.
+# There's no authentication, so the coordinator only listens on loopback
+# unless it's given another address to bind to.
+#
+# The protocol is one text line per request and per reply:
+#   lease                 -> block FIRST LAST, or done when there are no more
+#   finish FIRST          -> ok, the block starting at FIRST has been run
+#   log RUN LENGTH        -> ok, followed by LENGTH bytes of log file
+#   halt                  -> ok, the worker halted, lease nothing further
+#
+#------------------------------------------------------------------
+
+import os
+import socket
+import SocketServer
+import sys
+import threading
+import time
+from backend.workers import RunAllocator
+
+# Lease a block out again if it's not finished within this many seconds,
+# in case its worker hung without dropping the connection
+LEASE_TIMEOUT = 3600
+# Where the coordinator listens unless told otherwise
+DEFAULT_BIND_ADDRESS = "127.0.0.1"
+
+# Keeps track of which blocks of run numbers are leased to which worker
+class SeedLeaser(object):
+    # lastRunNumber - last run number to lease, -1 for no limit
+    def __init__(self, firstRunNumber, lastRunNumber=-1, blockSize=1000, leaseTimeout=LEASE_TIMEOUT):
+        self.lastRunNumber = lastRunNumber
+        self.blockSize = blockSize
+        self.leaseTimeout = leaseTimeout
+        self._nextRunNumber = firstRunNumber
+        # Blocks (first, last) taken back from lost workers, leased before new ones
+        self._returnedBlocks = []
+        # First run number => (last run number, holder, time leased)
+        self._leases = {}
+        self.finishedCount = 0
+        self.returnedCount = 0
+        self.isHalted = False
+        self._lock = threading.Lock()
+
+    # Returns (first, last) of the block leased to holder, None if there's nothing left
+    def lease(self, holder):
+        with self._lock:
+            if self.isHalted:
+                return None
+            self._expireLeases()
+            if self._returnedBlocks:
+                block = self._returnedBlocks.pop(0)
+            elif self.lastRunNumber < 0 or self._nextRunNumber <= self.lastRunNumber:
+                lastRunNumber = self._nextRunNumber + self.blockSize - 1
+                if self.lastRunNumber >= 0:
+                    lastRunNumber = min(lastRunNumber, self.lastRunNumber)
+                block = (self._nextRunNumber, lastRunNumber)
+                self._nextRunNumber = lastRunNumber + 1
+            else:
+                return None
+            self._leases[block[0]] = (block[1], holder, time.time())
+            return block
+
+    # The block starting at firstRunNumber has been run
+    def finish(self, firstRunNumber):
+        with self._lock:
+            if firstRunNumber in self._leases:
+                del self._leases[firstRunNumber]
+            # May have been returned after timing out, but it's done now
+            self._returnedBlocks = filter(lambda block: block[0] != firstRunNumber, self._returnedBlocks)
+            self.finishedCount += 1
+
+    # Take back every block leased to holder, returning how many there were
+    def release(self, holder):
+        with self._lock:
+            blocks = [(first, last) for (first, (last, blockHolder, _)) in self._leases.items() if blockHolder == holder]
+            self._returnBlocks(blocks)
+            return len(blocks)
+
+    def _expireLeases(self):
+        now = time.time()
+        self._returnBlocks([(first, last) for (first, (last, _, leaseTime)) in self._leases.items() if now - leaseTime > self.leaseTimeout])
+
+    def _returnBlocks(self, blocks):
+        for block in blocks:
+            del self._leases[block[0]]
+        self._returnedBlocks = sorted(self._returnedBlocks + blocks)
+        self.returnedCount += len(blocks)
+
+    # Stop leasing, blocks already leased are still run
+    def halt(self):
+        with self._lock:
+            self.isHalted = True
+
+    # Whether every block has been run (or halted with none left running)
+    def isDone(self):
+        with self._lock:
+            if self._leases:
+                return False
+            if self.isHalted:
+                return True
+            return not self._returnedBlocks and self.lastRunNumber >= 0 and self._nextRunNumber > self.lastRunNumber
+
+    def getReport(self):
+        with self._lock:
+            return ["%d blocks of up to %d run numbers finished, %d leased out now, %d leased again after being lost" % (self.finishedCount, self.blockSize, len(self._leases), self.returnedCount)]
+
+class _CampaignRequestHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        holder = "%s:%d" % self.client_address
+        print "Worker %s connected" % (holder)
+        try:
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    break
+                try:
+                    reply = self._handleRequest(holder, line.split())
+                except ValueError:
+                    reply = "error invalid request %s" % (line.strip())
+                self.wfile.write(reply + "\n")
+        except socket.error:
+            pass
+        finally:
+            releasedCount = self.server.leaser.release(holder)
+            if releasedCount:
+                print "Worker %s lost, leasing its %d unfinished block(s) again" % (holder, releasedCount)
+            else:
+                print "Worker %s disconnected" % (holder)
+
+    def _handleRequest(self, holder, words):
+        leaser = self.server.leaser
+        if words == ["lease"]:
+            block = leaser.lease(holder)
+            if block is None:
+                return "done"
+            print "Leased run numbers %d-%d to %s" % (block[0], block[1], holder)
+            return "block %d %d" % block
+        elif len(words) == 2 and words[0] == "finish":
+            leaser.finish(int(words[1]))
+            return "ok"
+        elif len(words) == 3 and words[0] == "log":
+            # The run number is the file name, so only ever a number
+            runNumber = int(words[1])
+            length = int(words[2])
+            if length < 0:
+                raise ValueError("Negative log length")
+            data = self.rfile.read(length)
+            with open(os.path.join(self.server.logFolderPath, "%d" % (runNumber)), "w") as logFile:
+                logFile.write(data)
+            print "Received log for run number %d from %s" % (runNumber, holder)
+            return "ok"
+        elif words == ["halt"]:
+            print "Worker %s halted, leasing no more blocks" % (holder)
+            leaser.halt()
+            return "ok"
+        return "error unknown request %s" % (" ".join(words))
+
+# The coordinator's side, serve_forever() handles each worker on its own thread
+class CampaignServer(SocketServer.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, port, leaser, logFolderPath, bindAddress=DEFAULT_BIND_ADDRESS):
+        SocketServer.ThreadingTCPServer.__init__(self, (bindAddress, port), _CampaignRequestHandler)
+        self.leaser = leaser
+        self.logFolderPath = logFolderPath
+
+# A worker's connection to the coordinator, safe to share between threads
+class CampaignClient(object):
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        try:
+            self._connection = socket.create_connection((host, port))
+        except socket.error as e:
+            sys.exit("Could not connect to coordinator %s:%d: %s" % (host, port, str(e)))
+        self._file = self._connection.makefile("rb")
+        self._lock = threading.Lock()
+
+    # Returns (first, last) of a newly leased block, or None if there are no more
+    def lease(self):
+        words = self._request("lease\n").split()
+        if words[0] == "done":
+            return None
+        return (int(words[1]), int(words[2]))
+
+    def finish(self, firstRunNumber):
+        self._request("finish %d\n" % (firstRunNumber))
+
+    # Send the coordinator a copy of a log, as Logger's log callback
+    def sendLog(self, runNumber, logFilePath):
+        with open(logFilePath, "rb") as logFile:
+            data = logFile.read()
+        self._request("log %d %d\n%s" % (runNumber, len(data), data))
+
+    def reportHalt(self):
+        self._request("halt\n")
+
+    def _request(self, request):
+        with self._lock:
+            try:
+                self._connection.sendall(request)
+                reply = self._file.readline()
+            except socket.error:
+                reply = ""
+            if not reply:
+                sys.exit("Lost connection to coordinator %s:%d" % (self.host, self.port))
+            if reply.startswith("error"):
+                sys.exit("Coordinator %s:%d refused request: %s" % (self.host, self.port, reply.strip()))
+            return reply.strip()
+
+    def close(self):
+        # The connection stays open while its file is
+        self._file.close()
+        self._connection.close()
+
+# Hands out run numbers leased from a coordinator instead of a fixed range,
+# telling it as each block is finished
+class LeasedRunAllocator(RunAllocator):
+    def __init__(self, client, testRunNumber=None):
+        RunAllocator.__init__(self, None, testRunNumber=testRunNumber)
+        self._client = client
+        # (first, last) of the block being handed out, None before the first lease
+        self._block = None
+        # First run number of each block => its run numbers handed out and not finished
+        self._unfinished = {}
+        self._isOutOfBlocks = False
+
+    def _take(self):
+        if self._nextRunNumber is not None and self._nextRunNumber == self.testRunNumber:
+            runNumber = self._nextRunNumber
+            self._nextRunNumber = None
+            self._inFlight.add(runNumber)
+            return runNumber
+        if self._block is None or self._nextRunNumber > self._block[1]:
+            if self._isOutOfBlocks:
+                return None
+            block = self._client.lease()
+            if block is None:
+                self._isOutOfBlocks = True
+                return None
+            self._block = block
+            self._unfinished[self._block[0]] = set()
+            self._nextRunNumber = self._block[0]
+        runNumber = self._nextRunNumber
+        self._nextRunNumber += 1
+        self._unfinished[self._block[0]].add(runNumber)
+        self._inFlight.add(runNumber)
+        return runNumber
+
+    def _finish(self, runNumber):
+        RunAllocator._finish(self, runNumber)
+        for runNumbers in self._unfinished.values():
+            runNumbers.discard(runNumber)
+        self._finishBlocks()
+
+    # Tell the coordinator about blocks that are all handed out and finished
+    def _finishBlocks(self):
+        for (firstRunNumber, runNumbers) in self._unfinished.items():
+            isHandedOut = firstRunNumber != self._block[0] or self._nextRunNumber > self._block[1]
+            if isHandedOut and not runNumbers:
+                del self._unfinished[firstRunNumber]
+                self._client.finish(firstRunNumber)
+
+    def getUpcoming(self, count):
+        with self._lock:
+            upcoming = sorted(self._inFlight)
+            if self._block is not None and self._nextRunNumber is not None:
+                upcoming.extend(range(self._nextRunNumber, min(self._nextRunNumber + count, self._block[1] + 1)))
+        return upcoming
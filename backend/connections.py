@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Target address resolution and pre-connected sockets
+#
+# The target is resolved once when the fuzzer starts, names with DNS,
+# rather than worked out from the host string every case.  With
+# --preconnect, each worker starts its next case's TCP connect as soon as
+# the current case has its connection, so the handshake happens while the
+# current case runs and the next case starts with a connected socket.
+#
+#------------------------------------------------------------------
+
+import errno
+import select
+import socket
+
+class ConnectionFactory(object):
+    # host - name or address to resolve, or a path (anything with a /) for a unix socket
+    # socketType - SOCK_STREAM or SOCK_DGRAM, or SOCK_RAW to resolve an address with no port
+    # sourceIP, sourcePort - address to bind sockets to, "" or "0.0.0.0" and -1 for any
+    # Raises socket.gaierror if host can't be resolved
+    def __init__(self, host, port, socketType, sourceIP="", sourcePort=-1):
+        self.socketType = socketType
+        self.sourceIP = sourceIP
+        self.sourcePort = sourcePort
+        if "/" in host:
+            self.family = socket.AF_UNIX
+            self.addr = host
+        else:
+            # "localhost" has always meant IPv4 here, even if it resolves to ::1 first
+            if host == "localhost":
+                host = "127.0.0.1"
+            if socketType == socket.SOCK_RAW:
+                port = None
+            (self.family, _, _, _, self.addr) = socket.getaddrinfo(host, port, 0, socketType)[0]
+
+    # Returns a new unconnected socket, bound to the source address if one was given
+    def create(self):
+        connection = socket.socket(self.family, self.socketType)
+        if self.family != socket.AF_UNIX:
+            hasSourceIP = self.sourceIP not in ("", "0.0.0.0")
+            if self.sourcePort != -1 or hasSourceIP:
+                # Port 0 picks any port
+                connection.bind((self.sourceIP if hasSourceIP else "", max(self.sourcePort, 0)))
+        return connection
+
+    # Returns a new socket with a connect to the target under way
+    # Finish it with a driver Connect op, which also reports if it failed
+    def startConnecting(self):
+        connection = self.create()
+        connection.setblocking(0)
+        connection.connect_ex(self.addr)
+        return connection
+
+# Whether a socket from startConnecting() can still be used for a case:
+# the connect hasn't failed and the server hasn't closed it while it waited
+# Unlike a connection kept from an earlier case, something to read is fine,
+# it's the server's greeting
+def isWarmConnectionUsable(connection):
+    try:
+        if not select.select([connection], [], [], 0)[0]:
+            return True
+        return len(connection.recv(1, socket.MSG_PEEK)) > 0
+    except socket.error as e:
+        return e.errno in (errno.EAGAIN, errno.EWOULDBLOCK)
+    except select.error:
+        return False
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Pre-generated mutation corpus
+#
+# Radamsa output for every fuzzed subcomponent across a seed range is
+# generated up front (on as many cores as are available) and stored in
+# a single file, which mutiny.py memory-maps and reads from instead of
+# running radamsa for each case.
+#
+# File layout, all integers little-endian:
+#   header       - magic, first seed, last seed, number of keys
+#   keys         - (message number, subcomponent number, input length)
+#                  for each fuzzed subcomponent, followed by the input
+#                  radamsa was given for it
+#   index        - (offset, length) per seed per key, seed-major
+#   data         - radamsa output
+#
+# The file is written under a temporary name and renamed once it's
+# complete, so an interrupted --pregenerate never leaves a corpus behind.
+#
+#------------------------------------------------------------------
+
+import mmap
+import multiprocessing
+import os
+import signal
+import struct
+import subprocess
+
+CORPUS_MAGIC = "MUTCORP1"
+HEADER_FORMAT = "<8sqqI"
+KEY_FORMAT = "<III"
+INDEX_FORMAT = "<QI"
+
+# Seeds handed to a worker at a time
+SEED_CHUNK_SIZE = 64
+# Python 2 only delivers CTRL+C to a pool result wait that has a timeout
+RESULT_WAIT_TIMEOUT = 3600
+
+# Returns list of (messageNumber, subcomponentNumber, input) for
+# every fuzzed subcomponent in fuzzerData, which is what gets mutated
+def getFuzzedSubcomponentKeys(fuzzerData):
+    keys = []
+    for i in range(0, len(fuzzerData.messageCollection.messages)):
+        message = fuzzerData.messageCollection.messages[i]
+        if not message.isOutbound():
+            continue
+        for j in range(0, len(message.subcomponents)):
+            if message.subcomponents[j].isFuzzed:
+                keys.append((i, j, str(message.subcomponents[j].getOriginalByteArray())))
+    return keys
+
+# Set up per-worker state once rather than pickling inputs for every seed
+# CTRL+C is handled by the parent, which terminates the pool
+def _initWorker(radamsaPath, inputs):
+    global _workerRadamsaPath, _workerInputs
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _workerRadamsaPath = radamsaPath
+    _workerInputs = inputs
+
+def _generateSeed(seed):
+    outputs = []
+    for fuzzerInput in _workerInputs:
+        radamsa = subprocess.Popen([_workerRadamsaPath, "--seed", str(seed)], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        (fuzzedOutput, errorOutput) = radamsa.communicate(input=fuzzerInput)
+        if radamsa.returncode != 0:
+            raise RuntimeError("radamsa failed for seed %d: %s" % (seed, errorOutput.strip()))
+        outputs.append(fuzzedOutput)
+    return outputs
+
+def _generateSeeds(seeds):
+    return [_generateSeed(seed) for seed in seeds]
+
+# Generate a corpus file for seeds firstSeed-lastSeed inclusive
+# processes - number of worker processes, defaults to one per core
+def generateCorpus(filePath, radamsaPath, fuzzerData, firstSeed, lastSeed, processes=None):
+    keys = getFuzzedSubcomponentKeys(fuzzerData)
+    if len(keys) == 0:
+        raise RuntimeError("No fuzzed subcomponents in .fuzzer, nothing to pregenerate")
+    seedCount = lastSeed - firstSeed + 1
+    if seedCount < 1:
+        raise RuntimeError("Invalid seed range %d-%d" % (firstSeed, lastSeed))
+
+    # Only renamed to filePath once everything is written
+    temporaryPath = "%s.%d" % (filePath, os.getpid())
+    try:
+        with open(temporaryPath, "wb") as outputFile:
+            outputFile.write(struct.pack(HEADER_FORMAT, CORPUS_MAGIC, firstSeed, lastSeed, len(keys)))
+            for (messageNumber, subcomponentNumber, fuzzerInput) in keys:
+                outputFile.write(struct.pack(KEY_FORMAT, messageNumber, subcomponentNumber, len(fuzzerInput)))
+                outputFile.write(fuzzerInput)
+
+            # Reserve the index, it's filled in once all data is written
+            indexOffset = outputFile.tell()
+            indexEntrySize = struct.calcsize(INDEX_FORMAT)
+            outputFile.seek(indexOffset + seedCount * len(keys) * indexEntrySize)
+            index = []
+
+            pool = multiprocessing.Pool(processes, _initWorker, (radamsaPath, [key[2] for key in keys]))
+            try:
+                # imap preserves ordering, so data can be streamed straight out seed-major
+                chunks = (xrange(seed, min(seed+SEED_CHUNK_SIZE, lastSeed+1)) for seed in xrange(firstSeed, lastSeed+1, SEED_CHUNK_SIZE))
+                results = pool.imap(_generateSeeds, chunks)
+                seedIndex = 0
+                while seedIndex < seedCount:
+                    for outputs in results.next(RESULT_WAIT_TIMEOUT):
+                        for fuzzedOutput in outputs:
+                            index.append((outputFile.tell(), len(fuzzedOutput)))
+                            outputFile.write(fuzzedOutput)
+                        seedIndex += 1
+                        if seedIndex % 1000 == 0:
+                            print "\tGenerated %d of %d seeds" % (seedIndex, seedCount)
+            finally:
+                pool.terminate()
+                pool.join()
+
+            outputFile.seek(indexOffset)
+            for (offset, length) in index:
+                outputFile.write(struct.pack(INDEX_FORMAT, offset, length))
+        os.rename(temporaryPath, filePath)
+    except BaseException:
+        # Including CTRL+C, don't leave a partial corpus around
+        if os.path.exists(temporaryPath):
+            os.remove(temporaryPath)
+        raise
+
+# Read-only access to a corpus written by generateCorpus()
+class MutationCorpus(object):
+    def __init__(self, filePath):
+        self._file = open(filePath, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, self.firstSeed, self.lastSeed, keyCount) = struct.unpack_from(HEADER_FORMAT, self._map, 0)
+        if magic != CORPUS_MAGIC:
+            raise RuntimeError("%s is not a mutation corpus" % (filePath))
+        offset = struct.calcsize(HEADER_FORMAT)
+
+        # (messageNumber, subcomponentNumber) => (key index, input radamsa was given)
+        self._keys = {}
+        for keyIndex in range(0, keyCount):
+            (messageNumber, subcomponentNumber, inputLength) = struct.unpack_from(KEY_FORMAT, self._map, offset)
+            offset += struct.calcsize(KEY_FORMAT)
+            self._keys[(messageNumber, subcomponentNumber)] = (keyIndex, self._map[offset:offset+inputLength])
+            offset += inputLength
+
+        self._keyCount = keyCount
+        self._indexOffset = offset
+        self._indexEntrySize = struct.calcsize(INDEX_FORMAT)
+
+        # Data starts after the index, so an entry pointing before that was
+        # never filled in, and the last entry's data ends the file
+        dataOffset = self._indexOffset + (self.lastSeed - self.firstSeed + 1) * keyCount * self._indexEntrySize
+        if len(self._map) < dataOffset:
+            raise RuntimeError("%s is an incomplete mutation corpus" % (filePath))
+        (lastOffset, lastLength) = struct.unpack_from(INDEX_FORMAT, self._map, dataOffset - self._indexEntrySize)
+        if lastOffset < dataOffset or lastOffset + lastLength > len(self._map):
+            raise RuntimeError("%s is an incomplete mutation corpus" % (filePath))
+
+    def hasSeed(self, seed):
+        return self.firstSeed <= seed <= self.lastSeed
+
+    # Returns pregenerated output for the given subcomponent and seed as a bytearray,
+    # or None if the corpus doesn't have it
+    # byteArray is the input that would be given to radamsa - if a message processor
+    # has altered it, the corpus no longer applies and None is returned
+    # sizeLimit - if not -1, only this much of the output is read
+    def get(self, messageNumber, subcomponentNumber, seed, byteArray, sizeLimit=-1):
+        if not self.hasSeed(seed):
+            return None
+        try:
+            (keyIndex, fuzzerInput) = self._keys[(messageNumber, subcomponentNumber)]
+        except KeyError:
+            return None
+        if fuzzerInput != byteArray:
+            return None
+
+        entry = (seed - self.firstSeed) * self._keyCount + keyIndex
+        (offset, length) = struct.unpack_from(INDEX_FORMAT, self._map, self._indexOffset + entry * self._indexEntrySize)
+        if sizeLimit != -1:
+            length = min(length, sizeLimit)
+        return bytearray(self._map[offset:offset+length])
+
+    # Same as get() for several subcomponents of one message at once
+    # Returns a list with None for any subcomponent that isn't available
+    def getBatch(self, messageNumber, subcomponentNumbers, seed, byteArrays, sizeLimit=-1):
+        return [self.get(messageNumber, subcomponentNumber, seed, byteArray, sizeLimit) for (subcomponentNumber, byteArray) in zip(subcomponentNumbers, byteArrays)]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
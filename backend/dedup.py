@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Duplicate fuzz case suppression
+#
+# Radamsa frequently produces the same output for different seeds.
+# Every outbound message in a case is hashed, and if the same sequence
+# of outbound data has already been sent, the case is skipped.  Cases
+# are tracked with Bloom filters, and the hashes of cases that ran to the
+# end are appended to an on-disk store so later campaigns with the same
+# .fuzzer skip them too.  The filters are sized for the stored hashes
+# plus the expected run, and another, bigger one is added whenever the
+# last fills up, so the false positive rate stays bounded however many
+# cases the store builds up.
+#
+#------------------------------------------------------------------
+
+import hashlib
+import math
+import os
+import struct
+import threading
+
+# Cases to size for when the run's length isn't known
+DEFAULT_CAPACITY = 1000000
+# False positive rate of the first filter, each one added after it has
+# half the rate of the last, so all of them together stay under twice this
+ERROR_RATE = 0.0001
+# Each filter added holds this many times as many cases as the last
+GROWTH_FACTOR = 2
+
+# Fixed-size probabilistic set - may report false positives at
+# roughly errorRate once capacity items are added, never false negatives
+class BloomFilter(object):
+    def __init__(self, capacity=DEFAULT_CAPACITY, errorRate=ERROR_RATE):
+        self.capacity = capacity
+        self.errorRate = errorRate
+        # Items added, once it reaches capacity the error rate is past errorRate
+        self.count = 0
+        self.bitCount = int(math.ceil(-capacity * math.log(errorRate) / (math.log(2) ** 2)))
+        self.hashCount = max(1, int(round(self.bitCount / float(capacity) * math.log(2))))
+        self._bits = bytearray((self.bitCount + 7) // 8)
+
+    # Double hashing on two 64 bit halves of an md5 digest
+    def _positions(self, digest):
+        (hashA, hashB) = struct.unpack("<QQ", digest[:16])
+        for i in xrange(self.hashCount):
+            yield (hashA + i * hashB) % self.bitCount
+
+    # Adds digest, returns True if it was (probably) already present
+    def add(self, digest):
+        wasPresent = True
+        for position in self._positions(digest):
+            mask = 1 << (position & 7)
+            if not self._bits[position >> 3] & mask:
+                wasPresent = False
+                self._bits[position >> 3] |= mask
+        if not wasPresent:
+            self.count += 1
+        return wasPresent
+
+    def isFull(self):
+        return self.count >= self.capacity
+
+    def __contains__(self, digest):
+        for position in self._positions(digest):
+            if not self._bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+class DuplicateCaseFilter(object):
+    # storePath - file of hashes from earlier campaigns, appended to as
+    #   new cases are seen.  None to only track this run
+    # expectedCount - cases this run is expected to check, DEFAULT_CAPACITY if unknown
+    # otherStorePaths - more files of hashes to load but not append to, such
+    #   as other processes' stores
+    def __init__(self, storePath=None, expectedCount=None, otherStorePaths=()):
+        self.storePath = storePath
+        self._storeFile = None
+        # Checks come from every worker thread
+        self._lock = threading.Lock()
+        # Cases checked / cases found to be duplicates
+        self.checkedCount = 0
+        self.duplicateCount = 0
+        self.storedCount = 0
+
+        loadPaths = filter(os.path.exists, ([storePath] if storePath else []) + list(otherStorePaths))
+        storedDigestCount = sum(os.path.getsize(path) / 16 for path in loadPaths)
+        # Filters checked in order, new cases go in the last
+        self._bloomFilters = [BloomFilter(max(1, storedDigestCount + (expectedCount or DEFAULT_CAPACITY)))]
+
+        for path in loadPaths:
+            with open(path, "rb") as storeFile:
+                while True:
+                    # Another process may be part way through appending one
+                    digest = storeFile.read(16)
+                    if len(digest) < 16:
+                        break
+                    self._add(digest)
+                    self.storedCount += 1
+        if storePath:
+            self._storeFile = open(storePath, "ab")
+
+    # Returns True if digest was (probably) already present
+    def _add(self, digest):
+        if self._contains(digest):
+            return True
+        lastFilter = self._bloomFilters[-1]
+        if lastFilter.isFull():
+            lastFilter = BloomFilter(lastFilter.capacity * GROWTH_FACTOR, lastFilter.errorRate / 2)
+            self._bloomFilters.append(lastFilter)
+        lastFilter.add(digest)
+        return False
+
+    def _contains(self, digest):
+        return any(digest in bloomFilter for bloomFilter in self._bloomFilters)
+
+    # Start hashing a new case
+    def newCase(self):
+        return hashlib.md5()
+
+    # Add one outbound message to caseHash
+    @staticmethod
+    def addMessage(caseHash, messageNumber, byteArray):
+        # Include number and length so message boundaries can't alias
+        caseHash.update(struct.pack("<II", messageNumber, len(byteArray)))
+        caseHash.update(byteArray)
+
+    # Returns True if a case with caseDigest (a finished case hash's digest())
+    # has been recorded before
+    def isDuplicate(self, caseDigest):
+        with self._lock:
+            self.checkedCount += 1
+            if self._contains(caseDigest):
+                self.duplicateCount += 1
+                return True
+        return False
+
+    # Record a case once it has run to the end, so one that couldn't be sent
+    # (the target was down, say) isn't skipped by later campaigns
+    def recordCase(self, caseDigest):
+        with self._lock:
+            if not self._add(caseDigest) and self._storeFile:
+                self._storeFile.write(caseDigest)
+
+    def getReport(self):
+        rate = 100.0 * self.duplicateCount / self.checkedCount if self.checkedCount else 0.0
+        return ["Skipped %d duplicate cases of %d (%.2f%%), %d hashes loaded from earlier campaigns" % (self.duplicateCount, self.checkedCount, rate, self.storedCount)]
+
+    def close(self):
+        with self._lock:
+            if self._storeFile:
+                self._storeFile.close()
+                self._storeFile = None
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Token dictionaries
+#
+# Tokens (keywords, delimiters, magic constants, length fields) pulled
+# out of a captured conversation by mutiny_prep.py.  The native mutator
+# inserts them into and swaps them around fuzzed data, which gets past
+# protocol parsers far sooner than random bytes alone.
+#
+# Saved one token per line, printably-formatted like .fuzzer messages
+#
+#------------------------------------------------------------------
+
+import re
+import struct
+
+from backend.fuzzer_types import Message
+
+# Runs of printable characters worth keeping whole
+PRINTABLE_RUN_REGEX = re.compile(r"[\x20-\x7e]{4,64}")
+# Words within printable data, split on common delimiters
+WORD_REGEX = re.compile(r"[^\x00-\x20\x7f-\xff/=:;&?,<>\"'()\[\]{}]{3,32}")
+# Delimiters commonly separating fields in text and binary protocols
+DELIMITERS = ["\r\n\r\n", "\r\n", "\n", ": ", "=", "&", ";", ",", "/", "?", "\x00"]
+# Messages made up only of these are treated as text, with no binary fields
+TEXT_REGEX = re.compile(r"[\x20-\x7e\r\n\t]*\Z")
+# Width of binary constants looked for across messages
+CONSTANT_WIDTH = 4
+# Only look this far into each message for constants and length fields
+SCAN_LIMIT = 4096
+LENGTH_SCAN_LIMIT = 64
+
+class TokenDictionary(object):
+    def __init__(self):
+        # List of bytearray tokens, most useful first
+        self.tokens = []
+        # Token => number of messages it was seen in, built by addMessage()
+        self._counts = {}
+        # Tokens that are kept regardless of count (delimiters, length fields)
+        self._pinned = []
+
+    def _count(self, tokens):
+        for token in set(tokens):
+            self._counts[token] = self._counts.get(token, 0) + 1
+
+    def _pin(self, token):
+        if token not in self._pinned:
+            self._pinned.append(token)
+
+    # Pull tokens out of one message's data (str or bytearray)
+    # Call getTokens() once all messages are added
+    def addMessage(self, data):
+        data = str(data)
+        
+        # Printable strings and the words within them
+        strings = []
+        for run in PRINTABLE_RUN_REGEX.findall(data):
+            strings.append(run)
+            strings.extend(WORD_REGEX.findall(run))
+        self._count(strings)
+        
+        for delimiter in DELIMITERS:
+            if delimiter in data:
+                self._pin(delimiter)
+        
+        # Binary constants, only kept if they turn up in more than one message
+        scanned = data[:SCAN_LIMIT]
+        constants = []
+        for offset in xrange(0, len(scanned) - CONSTANT_WIDTH + 1):
+            window = scanned[offset:offset+CONSTANT_WIDTH]
+            if not PRINTABLE_RUN_REGEX.match(window):
+                constants.append(window)
+        self._count(constants)
+        
+        if TEXT_REGEX.match(data):
+            return
+        
+        # Integers matching the length of the message or of the data following them
+        for (width, valueFormat) in ((1, "B"), (2, "H"), (4, "I")):
+            for endian in ("<", ">") if width > 1 else ("<",):
+                for offset in xrange(0, min(LENGTH_SCAN_LIMIT, len(data) - width + 1)):
+                    (value,) = struct.unpack_from(endian + valueFormat, data, offset)
+                    # Tiny values match by accident far too often
+                    if value >= 8 and value in (len(data), len(data) - offset - width):
+                        self._pin(data[offset:offset+width])
+
+    @staticmethod
+    def _isFullMatch(regex, token):
+        match = regex.match(token)
+        return match is not None and match.end() == len(token)
+
+    # Returns list of tokens as bytearrays, at most maxTokens long
+    # Delimiters and length fields come first, then the rest by how many
+    # messages they appeared in, longer tokens first on ties
+    def getTokens(self, maxTokens=256):
+        tokens = list(self._pinned)
+        ranked = sorted(self._counts.items(), key=lambda (token, count): (-count, -len(token), token))
+        for (token, count) in ranked:
+            if len(tokens) >= maxTokens:
+                break
+            isPrintable = self._isFullMatch(PRINTABLE_RUN_REGEX, token) or self._isFullMatch(WORD_REGEX, token)
+            if (isPrintable or count > 1) and token not in tokens:
+                tokens.append(token)
+        self.tokens = [bytearray(token) for token in tokens[:maxTokens]]
+        return self.tokens
+
+    def readFromFile(self, filePath):
+        self.tokens = []
+        with open(filePath, 'r') as inputFile:
+            for line in inputFile:
+                line = line.strip()
+                if line == "" or line.startswith("#"):
+                    continue
+                self.tokens.append(Message.deserializeByteArray(line))
+        return self.tokens
+
+    def writeToFile(self, filePath):
+        with open(filePath, 'w') as outputFile:
+            outputFile.write("# Token dictionary for dictionary-aware mutation, one token per line\n")
+            outputFile.write("# Tokens are printably-formatted like .fuzzer messages and may be edited freely\n")
+            for token in self.tokens:
+                outputFile.write("{0}\n".format(Message.serializeByteArray(token)))
+        return filePath
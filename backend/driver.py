@@ -0,0 +1,499 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Conversation drivers
+#
+# performRun() and the fuzzing loop are written as generators that yield
+# an I/O operation (Connect, StartTls, Send, Receive, ReceiveInto, Sleep) whenever they
+# need one, and get its result (or exception) back at the yield.  Yielding
+# another generator calls it, and a generator returns a value by raising
+# Return(value).
+#
+# runBlocking() carries out each operation with ordinary blocking socket
+# calls, one conversation at a time.  EventLoop runs any number of these
+# generators in one thread with non-blocking sockets and poll() (select()
+# where there's no poll()), each operation with its own deadline, so
+# thousands of conversations can be in flight at once (--workers N --async).  Either way the generator code,
+# and so the order of every MessageProcessor callback, is the same.
+#
+#------------------------------------------------------------------
+
+import errno
+import heapq
+import math
+import os
+import select
+import socket
+import ssl
+import sys
+import time
+import types
+
+# Raised by a driven generator to return a value to the generator that called it
+class Return(Exception):
+    def __init__(self, value=None):
+        Exception.__init__(self)
+        self.value = value
+
+# Connect connection to addr, with no timeout (same as socket.connect())
+class Connect(object):
+    def __init__(self, connection, addr):
+        self.connection = connection
+        self.addr = addr
+
+# Wrap a connected socket with TLS and handshake, result is the SSL socket
+# Uses context (an ssl.SSLContext) if given, so it can be shared across connections
+class StartTls(object):
+    def __init__(self, connection, context=None):
+        self.connection = connection
+        self.context = context
+
+# Send all of data, sendto addr for anything other than a stream socket
+# Raises socket.timeout if it can't be sent within timeout seconds
+class Send(object):
+    def __init__(self, connection, data, addr, timeout):
+        self.connection = connection
+        self.data = data
+        self.addr = addr
+        self.timeout = timeout
+
+# One recv() of up to size bytes (recvfrom() if isRecvFrom), result is the data
+# Raises socket.timeout if nothing arrives within timeout seconds
+class Receive(object):
+    def __init__(self, connection, size, timeout, isRecvFrom=False, addr=None):
+        self.connection = connection
+        self.size = size
+        self.timeout = timeout
+        self.isRecvFrom = isRecvFrom
+        self.addr = addr
+
+# recv_into() buffer (a bytearray or memoryview) until size bytes have arrived, the
+# connection closes, or nothing more arrives for gapTimeout seconds once
+# something has.  Result is the number of bytes read, at most len(buffer).
+# Raises socket.timeout if nothing arrives within timeout seconds, and
+# returns what it has if the rest doesn't arrive within timeout seconds.
+class ReceiveInto(object):
+    def __init__(self, connection, buffer, size, timeout, gapTimeout):
+        self.connection = connection
+        self.buffer = buffer
+        self.size = size
+        self.timeout = timeout
+        self.gapTimeout = gapTimeout
+
+class Sleep(object):
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+# Errors meaning a non-blocking call needs to wait
+WOULD_BLOCK_ERRORS = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINPROGRESS, errno.EALREADY)
+
+# Carries out op with blocking calls, returns its result
+def _performBlocking(op):
+    if isinstance(op, Connect):
+        _connectBlocking(op)
+    elif isinstance(op, StartTls):
+        if op.context:
+            return op.context.wrap_socket(op.connection)
+        return ssl.wrap_socket(op.connection)
+    elif isinstance(op, Send):
+        _sendBlocking(op)
+    elif isinstance(op, Receive):
+        _setTimeout(op.connection, op.timeout)
+        if op.isRecvFrom:
+            return op.connection.recvfrom(op.size)[0]
+        return op.connection.recv(op.size)
+    elif isinstance(op, ReceiveInto):
+        return _receiveIntoBlocking(op)
+    elif isinstance(op, Sleep):
+        time.sleep(op.seconds)
+    else:
+        raise TypeError("Unknown operation %r" % (op,))
+    return None
+
+# The socket may already have a non-blocking connect under way, a blocking
+# connect_ex() then waits for it to finish, or says it already has
+def _connectBlocking(op):
+    op.connection.setblocking(1)
+    result = op.connection.connect_ex(op.addr)
+    if result != 0 and result != errno.EISCONN:
+        raise socket.error(result, os.strerror(result))
+
+# settimeout() makes fcntl() calls every time, skip it when it wouldn't change anything
+def _setTimeout(connection, timeout):
+    if connection.gettimeout() != timeout:
+        connection.settimeout(timeout)
+
+# send() may only take part of the data, so keep going from where it left off
+def _sendBlocking(op):
+    if op.connection.type != socket.SOCK_STREAM:
+        _setTimeout(op.connection, op.timeout)
+        op.connection.sendto(op.data, op.addr)
+        return
+    view = memoryview(op.data)
+    sentCount = 0
+    deadline = time.time() + op.timeout
+    while sentCount < len(view):
+        timeout = deadline - time.time()
+        if timeout <= 0:
+            raise socket.timeout("timed out")
+        op.connection.settimeout(timeout)
+        sentCount += op.connection.send(view[sentCount:])
+
+def _receiveIntoBlocking(op):
+    view = memoryview(op.buffer)
+    receivedCount = 0
+    deadline = time.time() + op.timeout
+    while receivedCount < op.size:
+        timeout = deadline - time.time()
+        if receivedCount:
+            timeout = min(timeout, op.gapTimeout)
+            if timeout <= 0:
+                break
+        op.connection.settimeout(max(timeout, 0.001))
+        try:
+            received = op.connection.recv_into(view[receivedCount:])
+        except (socket.timeout, ssl.SSLError) as e:
+            # SSL sockets time out with an SSLError rather than socket.timeout
+            isTimeout = isinstance(e, socket.timeout) or "timed out" in str(e)
+            if receivedCount and isTimeout:
+                break
+            raise
+        if received == 0:
+            # Closed
+            break
+        receivedCount += received
+    return receivedCount
+
+# A driven generator and the generators it has called, innermost last
+class _CallStack(object):
+    def __init__(self, generator):
+        self._stack = [generator]
+        # What to send or throw in next
+        self._value = None
+        self._error = None
+
+    def isDone(self):
+        return not self._stack
+
+    def setResult(self, value):
+        self._value = value
+        self._error = None
+
+    def setError(self, error=None):
+        self._error = error or sys.exc_info()
+
+    # Stop every generator still running, innermost first
+    def close(self):
+        while self._stack:
+            try:
+                self._stack.pop().close()
+            except Exception:
+                pass
+
+    # Runs until the next operation, which is returned, or None once finished
+    # Exceptions that escape the outermost generator are raised
+    def advance(self):
+        while self._stack:
+            generator = self._stack[-1]
+            try:
+                if self._error:
+                    (error, self._error) = (self._error, None)
+                    op = generator.throw(*error)
+                else:
+                    (value, self._value) = (self._value, None)
+                    op = generator.send(value)
+            except Return as e:
+                self._stack.pop()
+                self._value = e.value
+                continue
+            except StopIteration:
+                self._stack.pop()
+                continue
+            except:
+                self._stack.pop()
+                if not self._stack:
+                    raise
+                self._error = sys.exc_info()
+                continue
+            
+            if isinstance(op, types.GeneratorType):
+                self._stack.append(op)
+                continue
+            return op
+        return None
+
+# Run generator to completion with blocking I/O, returns what it returns
+def runBlocking(generator):
+    callStack = _CallStack(generator)
+    while True:
+        op = callStack.advance()
+        if callStack.isDone():
+            return callStack._value
+        try:
+            callStack.setResult(_performBlocking(op))
+        except:
+            callStack.setError()
+
+# One generator being run by an EventLoop
+class _Task(object):
+    def __init__(self, generator):
+        self.callStack = _CallStack(generator)
+        self.op = None
+        # Socket and "r"/"w" being waited on, None if waiting on a timer
+        self.waitSocket = None
+        self.waitFor = None
+        # time.time() the wait times out (raising socket.timeout) or a Sleep ends
+        self.deadline = None
+        # How much of a Send has gone out
+        self.sentCount = 0
+        # How much of a ReceiveInto has arrived, and when it times out
+        self.receivedCount = 0
+        self.receiveDeadline = None
+
+class EventLoop(object):
+    def __init__(self):
+        self._tasks = []
+        # Heap of (deadline, sequence, task)
+        self._timers = []
+        self._timerSequence = 0
+
+    # Add generator to run, call before or during run()
+    def spawn(self, generator):
+        task = _Task(generator)
+        self._tasks.append(task)
+        self._step(task)
+
+    # Run until every task has finished
+    # Exceptions escaping a task (including SystemExit) stop the loop and are raised
+    def run(self):
+        while self._tasks:
+            self._poll()
+
+    # Stop any tasks left unfinished after run() raised
+    def close(self):
+        for task in self._tasks:
+            task.callStack.close()
+        self._tasks = []
+        self._timers = []
+
+    def _addTimer(self, task, seconds):
+        task.deadline = time.time() + seconds
+        self._timerSequence += 1
+        heapq.heappush(self._timers, (task.deadline, self._timerSequence, task))
+
+    def _wait(self, task, waitSocket, waitFor, timeout):
+        task.waitSocket = waitSocket
+        task.waitFor = waitFor
+        task.deadline = None
+        if timeout is not None:
+            self._addTimer(task, timeout)
+
+    # Advance task as far as it can go without blocking
+    def _step(self, task):
+        while True:
+            task.waitSocket = None
+            task.deadline = None
+            op = task.callStack.advance()
+            if task.callStack.isDone():
+                self._tasks.remove(task)
+                return
+            task.op = op
+            task.sentCount = 0
+            task.receivedCount = 0
+            try:
+                isFinished = self._start(task, op)
+            except:
+                task.callStack.setError()
+                continue
+            if not isFinished:
+                return
+
+    # Begin op, returns True if it completed immediately (result set on the task)
+    def _start(self, task, op):
+        if isinstance(op, Connect):
+            op.connection.setblocking(0)
+            result = op.connection.connect_ex(op.addr)
+            if result == 0 or result == errno.EISCONN:
+                task.callStack.setResult(None)
+                return True
+            if result not in WOULD_BLOCK_ERRORS:
+                raise socket.error(result, errno.errorcode.get(result, str(result)))
+            self._wait(task, op.connection, "w", None)
+            return False
+        elif isinstance(op, StartTls):
+            if op.context:
+                sslConnection = op.context.wrap_socket(op.connection, do_handshake_on_connect=False)
+            else:
+                sslConnection = ssl.wrap_socket(op.connection, do_handshake_on_connect=False)
+            task.op = StartTls(sslConnection, op.context)
+            return self._continue(task)
+        elif isinstance(op, Sleep):
+            self._addTimer(task, op.seconds)
+            return False
+        elif isinstance(op, (Send, Receive)):
+            op.connection.setblocking(0)
+            if not self._continue(task):
+                # Timer covers the whole operation, not each partial send
+                self._addTimer(task, op.timeout)
+                return False
+            return True
+        elif isinstance(op, ReceiveInto):
+            op.connection.setblocking(0)
+            task.receiveDeadline = time.time() + op.timeout
+            if not self._continue(task):
+                # If some arrived, _continue() has set the gap timer
+                if not task.receivedCount:
+                    self._addTimer(task, op.timeout)
+                return False
+            return True
+        raise TypeError("Unknown operation %r" % (op,))
+
+    # Try to make progress on task's current socket operation, returns True
+    # when complete (result set), False if it's now waiting on the socket
+    def _continue(self, task):
+        op = task.op
+        try:
+            if isinstance(op, Connect):
+                result = op.connection.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if result != 0:
+                    raise socket.error(result, errno.errorcode.get(result, str(result)))
+                task.callStack.setResult(None)
+            elif isinstance(op, StartTls):
+                op.connection.do_handshake()
+                task.callStack.setResult(op.connection)
+            elif isinstance(op, Send):
+                while task.sentCount < len(op.data):
+                    if op.connection.type == socket.SOCK_STREAM:
+                        task.sentCount += op.connection.send(memoryview(op.data)[task.sentCount:])
+                    else:
+                        op.connection.sendto(op.data, op.addr)
+                        task.sentCount = len(op.data)
+                task.callStack.setResult(None)
+            elif isinstance(op, Receive):
+                if op.isRecvFrom:
+                    task.callStack.setResult(op.connection.recvfrom(op.size)[0])
+                else:
+                    task.callStack.setResult(op.connection.recv(op.size))
+            elif isinstance(op, ReceiveInto):
+                view = memoryview(op.buffer)
+                while task.receivedCount < op.size:
+                    try:
+                        received = op.connection.recv_into(view[task.receivedCount:])
+                    except (ssl.SSLWantReadError, socket.error) as e:
+                        if task.receivedCount and (isinstance(e, ssl.SSLWantReadError) or e.errno in WOULD_BLOCK_ERRORS):
+                            # Restart the gap timer, it's counted from the last data
+                            self._addTimer(task, max(0, min(op.gapTimeout, task.receiveDeadline - time.time())))
+                        raise
+                    if received == 0:
+                        # Closed
+                        break
+                    task.receivedCount += received
+                task.callStack.setResult(task.receivedCount)
+        except ssl.SSLWantReadError:
+            task.waitSocket = op.connection
+            task.waitFor = "r"
+            return False
+        except ssl.SSLWantWriteError:
+            task.waitSocket = op.connection
+            task.waitFor = "w"
+            return False
+        except socket.error as e:
+            if e.errno not in WOULD_BLOCK_ERRORS:
+                raise
+            task.waitSocket = op.connection
+            task.waitFor = "w" if isinstance(op, (Connect, Send)) else "r"
+            return False
+        return True
+
+    # Same as select() but without its limit on file descriptor numbers
+    # (FD_SETSIZE, usually 1024), returns the set of sockets that are ready
+    def _pollSockets(self, readers, writers, timeout):
+        socketsByFd = {}
+        eventMasks = {}
+        for (sockets, eventMask) in ((readers, select.POLLIN), (writers, select.POLLOUT)):
+            for waitSocket in sockets:
+                fd = waitSocket.fileno()
+                socketsByFd.setdefault(fd, []).append(waitSocket)
+                eventMasks[fd] = eventMasks.get(fd, 0) | eventMask
+        poller = select.poll()
+        for (fd, eventMask) in eventMasks.items():
+            poller.register(fd, eventMask)
+        # poll() takes milliseconds, round up so a timer isn't polled for just before it's due
+        events = poller.poll(None if timeout is None else int(math.ceil(timeout * 1000)))
+        # Errors and hangups count as ready too, the socket call then reports them
+        return set(waitSocket for (fd, _) in events for waitSocket in socketsByFd[fd])
+
+    def _poll(self):
+        readers = [task.waitSocket for task in self._tasks if task.waitSocket and task.waitFor == "r"]
+        writers = [task.waitSocket for task in self._tasks if task.waitSocket and task.waitFor == "w"]
+        # Drop timers for operations that already finished
+        while self._timers and self._timers[0][2].deadline != self._timers[0][0]:
+            heapq.heappop(self._timers)
+        timeout = max(0, self._timers[0][0] - time.time()) if self._timers else None
+        
+        try:
+            if hasattr(select, "poll"):
+                ready = self._pollSockets(readers, writers, timeout)
+            else:
+                (readable, writable, _) = select.select(readers, writers, [], timeout)
+                ready = set(readable) | set(writable)
+        except select.error as e:
+            # Signals (CTRL+C, crash monitors) interrupt select
+            if e.args[0] == errno.EINTR:
+                return
+            raise
+        
+        for task in list(self._tasks):
+            if task.waitSocket is not None and task.waitSocket in ready:
+                try:
+                    isFinished = self._continue(task)
+                except:
+                    task.callStack.setError()
+                    isFinished = True
+                if isFinished:
+                    self._step(task)
+        
+        now = time.time()
+        while self._timers and self._timers[0][0] <= now:
+            (deadline, _, task) = heapq.heappop(self._timers)
+            if task.deadline != deadline or task not in self._tasks:
+                continue
+            if isinstance(task.op, Sleep):
+                task.callStack.setResult(None)
+            elif isinstance(task.op, ReceiveInto) and task.receivedCount:
+                task.callStack.setResult(task.receivedCount)
+            else:
+                try:
+                    raise socket.timeout("timed out")
+                except socket.timeout:
+                    task.callStack.setError()
+            self._step(task)
@@ -74,6 +74,9 @@ class Message(object):
         # Then 11,22,33 will be subcomponent 0, 44,55,66 will be subcomponent 1
         # If it's a traditional message, it will only have one element (entire message)
         self.subcomponents = []
+        # Largest output the mutator may return for a fuzzed subcomponent of this
+        # message, -1 to use the .fuzzer file's maxFuzzedSize
+        self.maxFuzzedSize = -1
 
     def getOriginalSubcomponents(self):
         return map(lambda subcomponent: subcomponent.message, self.subcomponents)
@@ -171,7 +174,7 @@ class Message(object):
         if len(self.subcomponents) < 1:
             return "{0} {1}\n".format(self.direction, "ERROR: No data in message.")
         else:
-            serializedMessage = "{0} {1}{2}\n".format(self.direction, "fuzz " if self.subcomponents[0].isFuzzed else "", self.serializeByteArray(self.subcomponents[0].message))
+            serializedMessage = "{0} {1}{2}{3}\n".format(self.direction, "fuzz " if self.subcomponents[0].isFuzzed else "", "maxFuzzedSize={0} ".format(self.maxFuzzedSize) if self.maxFuzzedSize != -1 else "", self.serializeByteArray(self.subcomponents[0].message))
             
             for subcomponent in self.subcomponents[1:]:
                 serializedMessage += "sub {0}{1}\n".format("fuzz " if subcomponent.isFuzzed else "", self.serializeByteArray(subcomponent.message))
@@ -235,6 +238,10 @@ class Message(object):
             if len(serializedData) < 3:
                 raise RuntimeError("Invalid message data")
         
+        for arg in args:
+            if arg.startswith("maxFuzzedSize="):
+                self.maxFuzzedSize = int(arg[len("maxFuzzedSize="):])
+        
         self.direction = direction
         self.setMessageFrom(self.Format.Ascii, messageData, isFuzzed)
     
@@ -302,8 +309,13 @@ class Logger(object):
                 print "Unable to create logging directory: %s" % (folderPath)
                 exit()
 
+        self._logCallback = None
         self.resetForNewRun()
 
+    # callback(runNumber, logFilePath) is called after each log is written
+    def setLogCallback(self, callback):
+        self._logCallback = callback
+
     # Store just the data, forget trying to make a Message object
     # With the subcomponents and everything, it just gets weird, 
     # and we don't need it
@@ -314,16 +326,30 @@ class Logger(object):
         # The highest message # this fuzz session made it to
         self._highestMessageNumber = messageNumber
 
+    # Seeds the run was mutated with before its own (see --guided)
+    def setParentSeeds(self, parentSeeds):
+        self.parentSeeds = parentSeeds
+
+    # Set of (messageNumber, subcomponentNumber) the run fuzzed, None if all (see --energy)
+    def setFocus(self, focus):
+        self.focus = focus
+
     def outputLastLog(self, runNumber, messageCollection, errorMessage):
-        return self._outputLog(runNumber, messageCollection, errorMessage, self._lastReceivedMessageData, self._lastHighestMessageNumber)
+        return self._outputLog(runNumber, messageCollection, errorMessage, self._lastReceivedMessageData, self._lastHighestMessageNumber, self._lastParentSeeds, self._lastFocus)
 
     def outputLog(self, runNumber, messageCollection, errorMessage):
-        return self._outputLog(runNumber, messageCollection, errorMessage, self.receivedMessageData, self._highestMessageNumber)
+        return self._outputLog(runNumber, messageCollection, errorMessage, self.receivedMessageData, self._highestMessageNumber, self.parentSeeds, self.focus)
 
-    def _outputLog(self, runNumber, messageCollection, errorMessage, receivedMessageData, highestMessageNumber):
-        with open(os.path.join(self._folderPath, str(runNumber)), "w") as outputFile:
+    def _outputLog(self, runNumber, messageCollection, errorMessage, receivedMessageData, highestMessageNumber, parentSeeds, focus):
+        logFilePath = os.path.join(self._folderPath, str(runNumber))
+        with open(logFilePath, "w") as outputFile:
             print "Logging run number %d" % (runNumber)
             outputFile.write("Log from run with seed %d\n" % (runNumber))
+            if parentSeeds:
+                outputFile.write("Mutated after parent seeds %s (reproduce with --parents %s)\n" % (",".join(map(str, parentSeeds)), ",".join(map(str, parentSeeds))))
+            if focus is not None:
+                focusString = ",".join("%d.%d" % target for target in sorted(focus))
+                outputFile.write("Only fuzzed subcomponents %s (reproduce with --focus %s)\n" % (focusString, focusString))
             outputFile.write("Error message: %s\n" % (errorMessage))
 
             if highestMessageNumber == -1 or runNumber == 0:
@@ -354,13 +380,22 @@ class Logger(object):
                 outputFile.write("\n")
                 i += 1
 
+        if self._logCallback:
+            self._logCallback(runNumber, logFilePath)
+
     def resetForNewRun(self):
         try:
             self._lastReceivedMessageData = deepcopy(self.receivedMessageData)
             self._lastHighestMessageNumber = self._highestMessageNumber
+            self._lastParentSeeds = self.parentSeeds
+            self._lastFocus = self.focus
         except AttributeError:
             self._lastReceivedMessageData = {}
             self._lastHighestMessageNumber = -1
+            self._lastParentSeeds = ()
+            self._lastFocus = None
 
         self.receivedMessageData = {}
         self.setHighestMessageNumber(-1)
+        self.setParentSeeds(())
+        self.setFocus(None)
@@ -63,8 +63,30 @@ class FuzzerData(object):
         self.sourceIP = "0.0.0.0"
         # Whether to perform a test run
         self.shouldPerformTestRun = True
+        # Whether to keep the connection open for the next case (tcp, tls, udp)
+        # Only reconnects after an error or the server closing it
+        self.reuseConnection = False
+        # Whether to build the IP header ourselves (IP_HDRINCL) for raw IP protocols
+        self.rawIpHeader = False
+        # For L2raw, how many frames to queue in a PACKET_TX_RING before
+        # sending them, 0 = send each frame as it's made
+        self.txRingBatch = 0
+        # For proto inproc, the Python callable to send messages to, as
+        # module:function with the module found from the .fuzzer's folder
+        self.inprocTarget = "none"
         # How long to time out on receive() (seconds)
         self.receiveTimeout = 1.0
+        # Once part of a response has arrived, how long to wait for the rest
+        # of it before going on with what we have (seconds), -1 = until receiveTimeout
+        self.receiveGapTimeout = -1
+        # Mutation engine, "radamsa" or "native"
+        self.mutator = "radamsa"
+        # Largest output the mutator may return for a fuzzed subcomponent, -1 = unlimited
+        # Can be overridden per message with maxFuzzedSize=N on the message line
+        self.maxFuzzedSize = -1
+        # Token dictionary file for dictionary-aware mutation, relative to the .fuzzer file,
+        # or "none"
+        self.dictionaryFile = "none"
         # Dictionary to save comments made to a .fuzzer file.  Only really does anything if 
         # using readFromFile and then writeToFile in the same program
         # (For example, fuzzerconverter)
@@ -157,9 +179,47 @@ class FuzzerData(object):
                         else:
                             raise RuntimeError("shouldPerformTestRun must be 0 or 1")
                         self._pushComments("shouldPerformTestRun")
+                    elif args[0] == "reuseConnection":
+                        # Use 0 or 1 for setting
+                        if args[1] == "0":
+                            self.reuseConnection = False
+                        elif args[1] == "1":
+                            self.reuseConnection = True
+                        else:
+                            raise RuntimeError("reuseConnection must be 0 or 1")
+                        self._pushComments("reuseConnection")
+                    elif args[0] == "rawIpHeader":
+                        # Use 0 or 1 for setting
+                        if args[1] == "0":
+                            self.rawIpHeader = False
+                        elif args[1] == "1":
+                            self.rawIpHeader = True
+                        else:
+                            raise RuntimeError("rawIpHeader must be 0 or 1")
+                        self._pushComments("rawIpHeader")
+                    elif args[0] == "txRingBatch":
+                        self.txRingBatch = int(args[1])
+                        if self.txRingBatch < 0:
+                            raise RuntimeError("txRingBatch must be 0 or more")
+                        self._pushComments("txRingBatch")
+                    elif args[0] == "inprocTarget":
+                        self.inprocTarget = args[1]
+                        self._pushComments("inprocTarget")
                     elif args[0] == "receiveTimeout":
                         self.receiveTimeout = float(args[1])
                         self._pushComments("receiveTimeout")
+                    elif args[0] == "receiveGapTimeout":
+                        self.receiveGapTimeout = float(args[1])
+                        self._pushComments("receiveGapTimeout")
+                    elif args[0] == "mutator":
+                        self.mutator = args[1]
+                        self._pushComments("mutator")
+                    elif args[0] == "maxFuzzedSize":
+                        self.maxFuzzedSize = int(args[1])
+                        self._pushComments("maxFuzzedSize")
+                    elif args[0] == "dictionary":
+                        self.dictionaryFile = args[1]
+                        self._pushComments("dictionary")
                     elif args[0] == "messagesToFuzz":
                         print("WARNING: It looks like you're using a legacy .fuzzer file with messagesToFuzz set.  This is now deprecated, so please update to the new format")
                         self.messagesToFuzz = validateNumberRange(args[1], flattenList=True)
@@ -278,6 +338,13 @@ class FuzzerData(object):
         else:
             fileDescriptor.write(self._getComments("receiveTimeout"))
         fileDescriptor.write("receiveTimeout {0}\n".format(self.receiveTimeout))
+
+        # Receive Gap Timeout
+        if defaultComments:
+            fileDescriptor.write("# Once part of a response arrives, how long to wait for the rest before using what arrived, -1 = until receiveTimeout\n")
+        else:
+            fileDescriptor.write(self._getComments("receiveGapTimeout"))
+        fileDescriptor.write("receiveGapTimeout {0}\n".format(self.receiveGapTimeout))
         
         # Should Perform Test Run
         if defaultComments:
@@ -286,6 +353,59 @@ class FuzzerData(object):
             fileDescriptor.write(self._getComments("shouldPerformTestRun"))
         sPTR = 1 if self.shouldPerformTestRun else 0
         fileDescriptor.write("shouldPerformTestRun {0}\n".format(sPTR))
+
+        # Reuse Connection
+        if defaultComments:
+            fileDescriptor.write("# Whether to keep the connection open between cases, reconnecting only after errors (tcp, tls, udp)\n")
+        else:
+            fileDescriptor.write(self._getComments("reuseConnection"))
+        fileDescriptor.write("reuseConnection {0}\n".format(1 if self.reuseConnection else 0))
+
+        # Raw IP Header
+        if defaultComments:
+            fileDescriptor.write("# Whether to send raw IP protocols with an IP header built by Mutiny (IP_HDRINCL), from sourceIP to the target\n")
+        else:
+            fileDescriptor.write(self._getComments("rawIpHeader"))
+        fileDescriptor.write("rawIpHeader {0}\n".format(1 if self.rawIpHeader else 0))
+
+        # TX Ring Batch
+        if defaultComments:
+            fileDescriptor.write("# For L2raw, send frames through a PACKET_TX_RING this many at a time (0 = one send() per frame)\n")
+        else:
+            fileDescriptor.write(self._getComments("txRingBatch"))
+        fileDescriptor.write("txRingBatch {0}\n".format(self.txRingBatch))
+
+        # In-process target
+        if defaultComments:
+            fileDescriptor.write("# For proto inproc, the Python callable (module:function) each outbound message\n")
+            fileDescriptor.write("# is passed to instead of a socket, relative to the .fuzzer file (\"none\" otherwise)\n")
+        else:
+            fileDescriptor.write(self._getComments("inprocTarget"))
+        fileDescriptor.write("inprocTarget {0}\n".format(self.inprocTarget))
+        
+        # Mutator
+        if defaultComments:
+            fileDescriptor.write("# Mutation engine to fuzz with (radamsa or native)\n")
+        else:
+            fileDescriptor.write(self._getComments("mutator"))
+        fileDescriptor.write("mutator {0}\n".format(self.mutator))
+        
+        # Max Fuzzed Size
+        if defaultComments:
+            fileDescriptor.write("# Largest mutator output allowed per fuzzed subcomponent, anything past this is\n")
+            fileDescriptor.write("# cut off (-1 for unlimited).  Add maxFuzzedSize=N after 'fuzz' on a message line\n")
+            fileDescriptor.write("# to override this for a single message\n")
+        else:
+            fileDescriptor.write(self._getComments("maxFuzzedSize"))
+        fileDescriptor.write("maxFuzzedSize {0}\n".format(self.maxFuzzedSize))
+        
+        # Dictionary
+        if defaultComments:
+            fileDescriptor.write("# Token dictionary used by the native mutator, either an absolute path or\n")
+            fileDescriptor.write("# relative to the .fuzzer file (\"none\" for no dictionary)\n")
+        else:
+            fileDescriptor.write(self._getComments("dictionary"))
+        fileDescriptor.write("dictionary {0}\n".format(self.dictionaryFile))
         
         # Protocol
         if defaultComments:
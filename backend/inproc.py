@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# In-process targets
+#
+# With proto inproc there are no sockets: each outbound message is passed
+# to a Python callable named by the .fuzzer's inprocTarget, module:function,
+# and whatever it returns is the response read by the next inbound message.
+# If it names a class, an instance is made for each case and called with
+# each of its messages, for parsers that keep state through a conversation.
+#
+#------------------------------------------------------------------
+
+import importlib
+import sys
+import traceback
+import types
+from mutiny_classes.mutiny_exceptions import InProcessTargetException
+
+# Returns the callable named by targetName, "module:function" (or module:Class,
+# or module:object.attribute), importing module from searchFolder if it's there
+# Raises ValueError if targetName isn't like that, ImportError or AttributeError
+# if it doesn't exist
+def loadInProcessTarget(targetName, searchFolder):
+    (moduleName, _, attributePath) = targetName.partition(":")
+    if not moduleName or not attributePath:
+        raise ValueError("%s isn't of the form module:function" % (targetName))
+    if searchFolder not in sys.path:
+        sys.path.insert(0, searchFolder)
+    target = importlib.import_module(moduleName)
+    for attributeName in attributePath.split("."):
+        target = getattr(target, attributeName)
+    if not callable(target):
+        raise ValueError("%s isn't callable" % (targetName))
+    return target
+
+# Takes the place of a case's socket
+# Anything the target raises comes out as InProcessTargetException, which
+# the default exception processor logs as a crash
+class InProcessConnection(object):
+    def __init__(self, target):
+        if isinstance(target, (type, types.ClassType)):
+            target = self._call(target)
+        self._target = target
+        # Responses not read by an inbound message yet
+        self._pending = bytearray()
+
+    @staticmethod
+    def _call(function, *args):
+        try:
+            return function(*args)
+        except Exception:
+            # Leaving out this frame, the traceback starts in the target
+            (exceptionType, exception, exceptionTraceback) = sys.exc_info()
+            raise InProcessTargetException("".join(traceback.format_exception(exceptionType, exception, exceptionTraceback.tb_next)))
+
+    # data is passed to the target as a bytearray, it may return a str,
+    # bytearray, or None for no response
+    def send(self, data):
+        response = self._call(self._target, data)
+        if response:
+            try:
+                self._pending.extend(response)
+            except TypeError:
+                raise InProcessTargetException("Target returned %s, not str, bytearray, or None" % (type(response).__name__))
+
+    # Returns everything the target responded since the last receive,
+    # empty if nothing
+    def receive(self):
+        (response, self._pending) = (self._pending, bytearray())
+        return response
+
+    def close(self):
+        self._pending = bytearray()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Mutation engines
+#
+# Mutator is the interface performRun() uses to fuzz subcomponents.
+# RadamsaPool (backend/radamsa.py) implements it by running radamsa,
+# NativeMutator below is a pure Python engine that needs no external
+# process.  Both must be deterministic per seed so crashes reproduce.
+#
+#------------------------------------------------------------------
+
+import random
+import struct
+
+class Mutator(object):
+    # Whether prepare() does anything, if not there's no need to work out
+    # which seeds are coming up (costly with many workers)
+    wantsUpcomingSeeds = False
+
+    # Returns mutated copy of byteArray for the given seed as a bytearray
+    # byteArray may be a bytearray, str, or memoryview and is not modified
+    # sizeLimit - if not -1, output is cut off after this many bytes, and
+    #   implementations should avoid producing/reading any more than that
+    def mutate(self, byteArray, seed, sizeLimit=-1):
+        raise NotImplementedError("Mutator subclasses must implement mutate()")
+
+    # Mutate several inputs (such as every fuzzed subcomponent of a message)
+    # with the same seed in one call, returns list of bytearrays in order
+    # Output must match calling mutate() on each individually
+    def mutateBatch(self, byteArrays, seed, sizeLimit=-1):
+        return [self.mutate(byteArray, seed, sizeLimit) for byteArray in byteArrays]
+
+    # Hint listing the seeds that will be requested next, in order
+    def prepare(self, seeds):
+        pass
+
+    def close(self):
+        pass
+
+# Values that commonly hit edge cases in integer handling
+INTERESTING_8 = [0x00, 0x01, 0x7f, 0x80, 0xff]
+INTERESTING_16 = [0x0000, 0x0080, 0x00ff, 0x0100, 0x7fff, 0x8000, 0xffff]
+INTERESTING_32 = [0x00000000, 0x0000ffff, 0x00010000, 0x7fffffff, 0x80000000, 0xffffffff]
+INTERESTING_64 = [0x7fffffffffffffff, 0x8000000000000000, 0xffffffffffffffff]
+
+# In-process mutation engine, pure Python
+# Applies a stack of havoc-style mutations, the count and choice of which
+# are drawn from random.Random(seed), so a given seed and input always
+# produce the same output
+class NativeMutator(Mutator):
+    # spliceSources - list of other inputs (such as the rest of the
+    #   conversation) that splice mutations can pull data from
+    # maxStackPower - up to 2**maxStackPower mutations are stacked per case
+    # maxBlockSize - largest block inserted/duplicated by a single mutation
+    # dictionary - list of tokens (see backend/dictionary.py) to insert and
+    #   swap into the data
+    def __init__(self, spliceSources=None, maxStackPower=5, maxBlockSize=1024, dictionary=None):
+        self.spliceSources = [bytearray(source) for source in spliceSources or [] if len(source) > 0]
+        self.dictionary = [bytearray(token) for token in dictionary or [] if len(token) > 0]
+        self.maxStackPower = maxStackPower
+        self.maxBlockSize = maxBlockSize
+        # Pairs of (weight, function), functions take (data, rng) and alter data in place
+        self.mutations = [
+            (4, self._flipBit),
+            (4, self._setRandomByte),
+            (3, self._interestingInteger),
+            (3, self._arithmetic),
+            (2, self._insertBlock),
+            (2, self._deleteBlock),
+            (2, self._duplicateBlock),
+            (1, self._overwriteBlock),
+            (1, self._splice),
+        ]
+        if self.dictionary:
+            # Only added with a dictionary so output without one doesn't change
+            self.mutations.append((3, self._insertToken))
+            self.mutations.append((3, self._replaceToken))
+        self._totalWeight = sum(weight for (weight, mutation) in self.mutations)
+
+    def mutate(self, byteArray, seed, sizeLimit=-1):
+        rng = random.Random(seed)
+        data = bytearray(byteArray)
+        stackCount = 1 << rng.randint(0, self.maxStackPower)
+        for _ in xrange(stackCount):
+            self._pickMutation(rng)(data, rng)
+        if sizeLimit != -1 and len(data) > sizeLimit:
+            # Growth per mutation is bounded by maxBlockSize, so just cut it off afterwards
+            del data[sizeLimit:]
+        return data
+
+    def _pickMutation(self, rng):
+        pick = rng.randrange(self._totalWeight)
+        for (weight, mutation) in self.mutations:
+            if pick < weight:
+                return mutation
+            pick -= weight
+        return self.mutations[-1][1]
+
+    def _blockLength(self, rng, limit):
+        # Favor small blocks, occasionally go large
+        limit = max(1, min(limit, self.maxBlockSize))
+        if rng.randrange(4):
+            return rng.randint(1, min(limit, 16))
+        return rng.randint(1, limit)
+
+    def _flipBit(self, data, rng):
+        if len(data) == 0:
+            return
+        bit = rng.randrange(len(data) * 8)
+        data[bit >> 3] ^= 0x80 >> (bit & 7)
+
+    def _setRandomByte(self, data, rng):
+        if len(data) == 0:
+            return
+        position = rng.randrange(len(data))
+        # Always change the byte
+        data[position] ^= rng.randint(1, 0xff)
+
+    def _interestingInteger(self, data, rng):
+        width = rng.choice((1, 2, 4, 8))
+        if len(data) < width:
+            return
+        if width == 1:
+            packed = chr(rng.choice(INTERESTING_8))
+        else:
+            endian = rng.choice(("<", ">"))
+            if width == 2:
+                packed = struct.pack(endian + "H", rng.choice(INTERESTING_16))
+            elif width == 4:
+                packed = struct.pack(endian + "I", rng.choice(INTERESTING_32 + INTERESTING_16))
+            else:
+                packed = struct.pack(endian + "Q", rng.choice(INTERESTING_64 + INTERESTING_32))
+        position = rng.randrange(len(data) - width + 1)
+        data[position:position+width] = packed
+
+    def _arithmetic(self, data, rng):
+        width = rng.choice((1, 2, 4))
+        if len(data) < width:
+            return
+        valueFormat = rng.choice(("<", ">")) + {1: "B", 2: "H", 4: "I"}[width]
+        position = rng.randrange(len(data) - width + 1)
+        (value,) = struct.unpack_from(valueFormat, data, position)
+        value = (value + rng.choice((-1, 1)) * rng.randint(1, 35)) & ((1 << (width * 8)) - 1)
+        data[position:position+width] = struct.pack(valueFormat, value)
+
+    def _insertBlock(self, data, rng):
+        length = self._blockLength(rng, self.maxBlockSize)
+        if rng.randrange(2):
+            block = bytearray(rng.getrandbits(8) for _ in xrange(length))
+        else:
+            block = bytearray(chr(rng.getrandbits(8))) * length
+        position = rng.randint(0, len(data))
+        data[position:position] = block
+
+    def _deleteBlock(self, data, rng):
+        if len(data) < 2:
+            return
+        length = self._blockLength(rng, len(data) - 1)
+        position = rng.randrange(len(data) - length + 1)
+        del data[position:position+length]
+
+    def _duplicateBlock(self, data, rng):
+        if len(data) == 0:
+            return
+        length = self._blockLength(rng, len(data))
+        source = rng.randrange(len(data) - length + 1)
+        block = data[source:source+length] * rng.randint(1, 4)
+        position = rng.randint(0, len(data))
+        data[position:position] = block
+
+    def _overwriteBlock(self, data, rng):
+        if len(data) < 2:
+            return
+        length = self._blockLength(rng, len(data) - 1)
+        source = rng.randrange(len(data) - length + 1)
+        destination = rng.randrange(len(data) - length + 1)
+        data[destination:destination+length] = data[source:source+length]
+
+    # Replace the tail of data from a random point with part of another input
+    def _splice(self, data, rng):
+        if not self.spliceSources:
+            # Nothing to splice with, cross the input over with itself
+            self._duplicateBlock(data, rng)
+            return
+        source = rng.choice(self.spliceSources)
+        sourceStart = rng.randrange(len(source))
+        sourceEnd = rng.randint(sourceStart+1, len(source))
+        position = rng.randint(0, len(data))
+        data[position:] = source[sourceStart:sourceEnd]
+
+    def _insertToken(self, data, rng):
+        token = rng.choice(self.dictionary)
+        position = rng.randint(0, len(data))
+        data[position:position] = token
+
+    # Swap a token already in data for another one, or if the chosen
+    # token isn't present, write a token over data at a random spot
+    def _replaceToken(self, data, rng):
+        if len(data) == 0:
+            return
+        token = rng.choice(self.dictionary)
+        position = data.find(token)
+        if position != -1:
+            data[position:position+len(token)] = rng.choice(self.dictionary)
+        else:
+            position = rng.randrange(len(data))
+            data[position:position+len(token)] = token
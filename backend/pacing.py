@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Adaptive pacing
+#
+# With --rate and/or --concurrency, instead of sleeping --sleeptime
+# between cases, cases start no faster than a token bucket refills and no
+# more than a limit run at once.  Both are upper limits: after every
+# WINDOW_CASES cases, if responses took much longer than usual or more
+# cases failed than usual, the rate and concurrency in use are halved,
+# otherwise they creep back up towards the limits (AIMD).  Like TCP, they
+# start low and double every window until the first backoff, so what's
+# usual is learned before the target is loaded.
+#
+#------------------------------------------------------------------
+
+import threading
+import time
+
+# Cases between adjustments
+WINDOW_CASES = 20
+# Back off when the mean receive time is over this many times the usual,
+# plus this many seconds so microsecond jitter on loopback doesn't count
+LATENCY_FACTOR = 2.0
+LATENCY_MARGIN = 0.005
+# ...or the share of cases failing is this much over the usual
+ERROR_RATE_MARGIN = 0.1
+# The usual level follows a rise by this fraction per window, so a target
+# that stays slower is eventually taken as normal, and a fall at once
+USUAL_RISE = 0.05
+# The rate starts at this fraction of its limit, concurrency at 1
+START_FRACTION = 0.1
+# After the first backoff, each window without trouble adds this fraction
+# of the rate limit back, or 1 to the concurrency
+RATE_INCREASE = 0.05
+# Backing off never goes below this many cases/sec (or the limit if it's lower)
+MIN_RATE = 0.1
+# How often a case waiting for a free slot under --concurrency checks again
+SLOT_POLL_SECONDS = 0.005
+
+class RateController(object):
+    # maxRate - cases per second at most, None for no limit
+    # maxInFlight - cases running at once at most, None for no limit
+    def __init__(self, maxRate=None, maxInFlight=None):
+        self.maxRate = maxRate
+        self.maxInFlight = maxInFlight
+        # Limits in use, lowered when the target is struggling
+        self.rate = None
+        if maxRate is not None:
+            self.rate = max(min(MIN_RATE, maxRate), maxRate * START_FRACTION)
+        self.inFlightLimit = None
+        if maxInFlight is not None:
+            self.inFlightLimit = 1
+        # Doubling the limits until the target first struggles
+        self.isSlowStart = True
+        self.inFlight = 0
+        self.backoffCount = 0
+        # Token bucket holding at most one token, so cases are spread evenly
+        # Goes negative when cases have reserved tokens ahead of time
+        self._tokens = 1.0
+        self._refillTime = time.time()
+        # Cases, failed cases, and receive times since the last adjustment
+        self._windowCases = 0
+        self._windowErrors = 0
+        self._windowReceiveSeconds = 0.0
+        self._windowReceiveCount = 0
+        # Levels the target usually runs at, None until the first window
+        self._usualErrorRate = None
+        self._usualReceiveSeconds = None
+        # Used from every worker thread
+        self._lock = threading.Lock()
+
+    # Call before each case
+    # Returns None if --concurrency cases are already running (call again
+    # after SLOT_POLL_SECONDS), otherwise the case counts as running until
+    # finishCase() and this returns the seconds to wait before starting it
+    def startCase(self):
+        with self._lock:
+            if self.inFlightLimit is not None and self.inFlight >= self.inFlightLimit:
+                return None
+            self.inFlight += 1
+            if self.rate is None:
+                return 0.0
+            now = time.time()
+            self._tokens = min(1.0, self._tokens + (now - self._refillTime) * self.rate)
+            self._refillTime = now
+            # Take the token now, and wait until it would have been there
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    # isError - whether the case ended with an exception or was retried
+    def finishCase(self, isError):
+        with self._lock:
+            self.inFlight -= 1
+            self._windowCases += 1
+            if isError:
+                self._windowErrors += 1
+            if self._windowCases >= WINDOW_CASES:
+                self._adjust()
+
+    # Record the mean time one of a case's receives took
+    def recordReceiveSeconds(self, seconds):
+        with self._lock:
+            self._windowReceiveSeconds += seconds
+            self._windowReceiveCount += 1
+
+    @staticmethod
+    def _followUsual(usual, value):
+        if usual is None or value < usual:
+            return value
+        return usual + (value - usual) * USUAL_RISE
+
+    def _adjust(self):
+        errorRate = float(self._windowErrors) / self._windowCases
+        isStruggling = self._usualErrorRate is not None and errorRate > self._usualErrorRate + ERROR_RATE_MARGIN
+        self._usualErrorRate = self._followUsual(self._usualErrorRate, errorRate)
+        if self._windowReceiveCount:
+            receiveSeconds = self._windowReceiveSeconds / self._windowReceiveCount
+            if self._usualReceiveSeconds is not None and receiveSeconds > self._usualReceiveSeconds * LATENCY_FACTOR + LATENCY_MARGIN:
+                isStruggling = True
+            self._usualReceiveSeconds = self._followUsual(self._usualReceiveSeconds, receiveSeconds)
+
+        if isStruggling:
+            self.isSlowStart = False
+            self.backoffCount += 1
+            if self.rate is not None:
+                self.rate = max(min(MIN_RATE, self.maxRate), self.rate / 2)
+            if self.inFlightLimit is not None:
+                self.inFlightLimit = max(1, self.inFlightLimit / 2)
+        elif self.isSlowStart:
+            if self.rate is not None:
+                self.rate = min(self.maxRate, self.rate * 2)
+            if self.inFlightLimit is not None:
+                self.inFlightLimit = min(self.maxInFlight, self.inFlightLimit * 2)
+        else:
+            if self.rate is not None:
+                self.rate = min(self.maxRate, self.rate + self.maxRate * RATE_INCREASE)
+            if self.inFlightLimit is not None:
+                self.inFlightLimit = min(self.maxInFlight, self.inFlightLimit + 1)
+
+        self._windowCases = 0
+        self._windowErrors = 0
+        self._windowReceiveSeconds = 0.0
+        self._windowReceiveCount = 0
+
+    def getReport(self):
+        limits = []
+        if self.rate is not None:
+            limits.append("%.2f cases/sec (limit %.2f)" % (self.rate, self.maxRate))
+        if self.inFlightLimit is not None:
+            limits.append("%d cases at once (limit %d)" % (self.inFlightLimit, self.maxInFlight))
+        return ["Pacing at %s, backed off %d times" % (" and ".join(limits), self.backoffCount)]
@@ -35,8 +35,13 @@
 #------------------------------------------------------------------
 
 
+import socket
+import struct
 from ctypes import *
 ### L2 ###
+# Every protocol, for AF_PACKET sockets
+ETH_P_ALL = 0x0003
+
 class ETH(Structure):
     _pack_=1
     _fields_ = [
@@ -74,7 +79,8 @@ PROTO = {
          "sctp":132 
 }
 
-class IP(Structure):
+# Network byte order, so bytearray(IP(...)) is the header as sent
+class IP(BigEndianStructure):
     _pack_=1
     _fields_ = [
     ("version", c_ubyte,4),
@@ -82,7 +88,7 @@ class IP(Structure):
     ("tos", c_ubyte),
     ("length", c_ushort),
     ("id", c_ushort),
-    ("flags", c_ubyte,3),
+    ("flags", c_ushort,3),
     ("fragOffset", c_ushort,13),
     ("ttl", c_ubyte),
     ("proto", c_ubyte),
@@ -93,6 +99,31 @@ class IP(Structure):
     #("padding", c_ubyte * 2)
     ]
 
+# IPv4 header for sending packets of one protocol from sourceIP to
+# destinationIP over an IP_HDRINCL socket.  The header is built once, only
+# the length and checksum change from packet to packet.
+class IPHeaderTemplate(object):
+    def __init__(self, proto, sourceIP, destinationIP, ttl=64):
+        header = IP(version=4, ihl=sizeof(IP) / 4, ttl=ttl, proto=proto,
+            ipSrc=struct.unpack("!I", socket.inet_aton(sourceIP))[0],
+            ipDst=struct.unpack("!I", socket.inet_aton(destinationIP))[0])
+        self._header = bytearray(header)
+        # One's complement sum of the header with no length or checksum,
+        # so each packet's checksum only needs its length added in
+        self._partialSum = sum(struct.unpack("!%dH" % (len(self._header) / 2), str(self._header)))
+
+    # Returns a new bytearray of the header followed by payload
+    def build(self, payload):
+        packet = self._header + payload
+        # Anything longer is refused by the kernel when it's sent
+        length = min(len(packet), 0xffff)
+        checksum = self._partialSum + length
+        checksum = (checksum & 0xffff) + (checksum >> 16)
+        checksum = (checksum & 0xffff) + (checksum >> 16)
+        struct.pack_into("!H", packet, 2, length)
+        struct.pack_into("!H", packet, 10, ~checksum & 0xffff)
+        return packet
+
 ### L4 ###
 class TCP(Structure):
     _fields_ = [
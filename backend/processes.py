@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Multi-process fuzzing
+#
+# With --processes N, mutiny forks N processes, each fuzzing every Nth
+# run number and logging to the same folder.  The process that forked
+# them is left as a coordinator: it passes CTRL+C on, stops every
+# process when one halts, and adds up their stats once they're done.
+# Processes report back over a pipe, one line per message.
+#
+#------------------------------------------------------------------
+
+import errno
+import fcntl
+import json
+import os
+import select
+import signal
+import sys
+
+class ProcessCoordinator(object):
+    def __init__(self, processCount):
+        self.processCount = processCount
+        # Process number in a forked process, None in the coordinator
+        self.processNumber = None
+        # Sum of the stats counters reported by every process
+        self.counters = {}
+        # Process number => read end of its pipe
+        self._pipes = {}
+        # Process number => partial line read from its pipe
+        self._buffers = {}
+        # pid => process number, for processes still running
+        self._pids = {}
+        self._readyProcesses = set()
+        self._isStopping = False
+        # Write end of the pipe, in a forked process
+        self._writeFd = None
+
+    # Forks the processes, returning the process number in each of them
+    # and None in the coordinator once they've all exited
+    # isFirstSolo - start the other processes only once process 0 reports
+    #   ready, so the test run completes before any fuzzing starts
+    def run(self, isFirstSolo):
+        previousHandler = signal.signal(signal.SIGINT, self._sigintHandler)
+        for processNumber in range(0, self.processCount):
+            if self._isStopping:
+                break
+            if self._fork(processNumber):
+                signal.signal(signal.SIGINT, previousHandler)
+                return processNumber
+            if processNumber == 0 and isFirstSolo:
+                while 0 not in self._readyProcesses and 0 in self._pids.values():
+                    self._poll()
+        # Keep reading after they've exited, stats are sent on the way out
+        while self._pids or self._pipes:
+            self._poll()
+        signal.signal(signal.SIGINT, previousHandler)
+        return None
+
+    # Returns True in the forked process
+    def _fork(self, processNumber):
+        # Buffered output would otherwise be printed again by the new process
+        sys.stdout.flush()
+        (readFd, writeFd) = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(readFd)
+            for otherReadFd in self._pipes.values():
+                os.close(otherReadFd)
+            self._pipes = {}
+            self._pids = {}
+            # Don't leak the pipe into radamsa or processes started by a
+            # monitor, or the coordinator won't see it close
+            fcntl.fcntl(writeFd, fcntl.F_SETFD, fcntl.fcntl(writeFd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+            # Own process group, so CTRL+C from the terminal only reaches
+            # the coordinator, which passes it on exactly once
+            os.setpgrp()
+            self.processNumber = processNumber
+            self._writeFd = writeFd
+            return True
+        os.close(writeFd)
+        self._pipes[processNumber] = readFd
+        self._buffers[processNumber] = ""
+        self._pids[pid] = processNumber
+        return False
+
+    # Read whatever the processes have sent and reap any that have exited
+    def _poll(self):
+        try:
+            readable = select.select(self._pipes.values(), [], [], 0.1)[0]
+        except select.error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            readable = []
+        for (processNumber, readFd) in self._pipes.items():
+            if readFd not in readable:
+                continue
+            data = os.read(readFd, 4096)
+            if not data:
+                os.close(readFd)
+                del self._pipes[processNumber]
+                continue
+            lines = (self._buffers[processNumber] + data).split("\n")
+            self._buffers[processNumber] = lines.pop()
+            for line in lines:
+                self._handleLine(processNumber, line)
+
+        while self._pids:
+            try:
+                (pid, status) = os.waitpid(-1, os.WNOHANG)
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            if pid == 0:
+                break
+            processNumber = self._pids.pop(pid)
+            if status != 0:
+                print "Process %d exited with status %d, stopping the other processes" % (processNumber, status)
+                self.stop()
+
+    def _handleLine(self, processNumber, line):
+        if line == "ready":
+            self._readyProcesses.add(processNumber)
+        elif line == "halt":
+            print "Process %d halted, stopping the other processes" % (processNumber)
+            # It's already on its way out
+            self.stop(processNumber)
+        elif line.startswith("stats "):
+            for (counterName, value) in json.loads(line[len("stats "):]).items():
+                self.counters[counterName] = self.counters.get(counterName, 0) + value
+
+    # Ask every process still running to stop, as CTRL+C would
+    # skipProcessNumber - process to leave alone, if any
+    def stop(self, skipProcessNumber=None):
+        if self._isStopping:
+            return
+        self._isStopping = True
+        for (pid, processNumber) in self._pids.items():
+            if processNumber == skipProcessNumber:
+                continue
+            try:
+                os.kill(pid, signal.SIGINT)
+            except OSError:
+                # Already gone
+                pass
+
+    def _sigintHandler(self, signal, frame):
+        print "\nSIGINT received, stopping processes\n"
+        self.stop()
+
+    # Called in a forked process
+    def reportReady(self):
+        self._send("ready")
+
+    def reportHalt(self):
+        self._send("halt")
+
+    def reportStats(self, counters):
+        self._send("stats %s" % (json.dumps(counters)))
+
+    def _send(self, line):
+        # Short enough to be written in one piece, even from several threads
+        os.write(self._writeFd, line + "\n")
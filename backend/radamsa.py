@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Pool of pre-spawned radamsa processes
+#
+# Radamsa only accepts its seed on the command line, so a given process
+# can only ever produce the output for the seed it was started with.
+# To take fork/exec and radamsa's startup off the critical path, the
+# pool spawns processes for upcoming seeds on a background thread.  They
+# sit blocked on stdin until a mutation is requested, so output is
+# byte-for-byte identical to running "radamsa --seed N" by hand.
+#
+#------------------------------------------------------------------
+
+import errno
+import os
+import select
+import subprocess
+import threading
+from backend.mutators import Mutator
+
+# Inputs up to this size always fit in a pipe buffer, so writing them can't block
+PIPE_SAFE_WRITE_SIZE = 4096
+
+class RadamsaPool(Mutator):
+    wantsUpcomingSeeds = True
+
+    # radamsaPath - path to radamsa binary
+    # processesPerSeed - how many mutations will be requested per seed
+    #   (one per fuzzed subcomponent in the conversation)
+    def __init__(self, radamsaPath, processesPerSeed=1):
+        self.radamsaPath = radamsaPath
+        self.processesPerSeed = processesPerSeed
+        # seed => list of spawned processes waiting for input
+        self._warm = {}
+        # Seeds the background thread should have processes ready for
+        self._wantedSeeds = []
+        self._lock = threading.Lock()
+        self._wakeEvent = threading.Event()
+        self._isClosed = False
+
+        self._thread = threading.Thread(target=self._spawnLoop)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _spawn(self, seed):
+        # close_fds is required as these processes outlive the fuzz case that
+        # spawned them - an inherited target socket would never actually close,
+        # and an inherited write end of another radamsa's stdin would keep it
+        # from ever seeing EOF
+        # stderr is discarded, an unread stderr pipe could fill up and stall radamsa
+        # while mutateBatch() is blocked reading another process's stdout
+        with open(os.devnull, "wb") as devNull:
+            return subprocess.Popen([self.radamsaPath, "--seed", str(seed)], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=devNull, close_fds=True)
+
+    @staticmethod
+    def _kill(process):
+        try:
+            process.kill()
+            process.wait()
+        except OSError:
+            pass
+
+    # Background thread, keeps processesPerSeed processes ready for every wanted seed
+    def _spawnLoop(self):
+        while not self._isClosed:
+            self._wakeEvent.wait()
+            self._wakeEvent.clear()
+
+            for seed in list(self._wantedSeeds):
+                while not self._isClosed:
+                    with self._lock:
+                        if seed not in self._wantedSeeds or len(self._warm.get(seed, [])) >= self.processesPerSeed:
+                            break
+                    process = self._spawn(seed)
+                    with self._lock:
+                        if seed in self._wantedSeeds and not self._isClosed:
+                            self._warm.setdefault(seed, []).append(process)
+                            process = None
+                    if process:
+                        # Seed was dropped while we were spawning
+                        self._kill(process)
+
+    # Tell the pool which seeds will be requested next, in order
+    # Any processes for seeds no longer in the list are killed
+    def prepare(self, seeds):
+        staleProcesses = []
+        with self._lock:
+            self._wantedSeeds = list(seeds)
+            for seed in self._warm.keys():
+                if seed not in self._wantedSeeds:
+                    staleProcesses.extend(self._warm.pop(seed))
+        for process in staleProcesses:
+            self._kill(process)
+        self._wakeEvent.set()
+
+    # Returns count processes for seed, warm ones first
+    def _acquire(self, seed, count):
+        with self._lock:
+            # Seed is in use now, don't let the background thread top it back up
+            if seed in self._wantedSeeds:
+                self._wantedSeeds.remove(seed)
+            processes = self._warm.get(seed, [])
+            acquired = processes[:count]
+            del processes[:count]
+        # Nothing warmed up for the rest, fall back to spawning on demand
+        while len(acquired) < count:
+            acquired.append(self._spawn(seed))
+        return acquired
+
+    # Returns radamsa's output for byteArray and seed as a bytearray
+    def mutate(self, byteArray, seed, sizeLimit=-1):
+        return self.mutateBatch([byteArray], seed, sizeLimit)[0]
+
+    @staticmethod
+    def _writeInput(process, byteArray):
+        # Radamsa's output depends on how its input is chunked, so write
+        # PIPE_BUF at a time exactly like communicate() does
+        inputView = memoryview(byteArray)
+        try:
+            offset = 0
+            while offset < len(inputView):
+                offset += os.write(process.stdin.fileno(), inputView[offset:offset+select.PIPE_BUF])
+        except OSError as e:
+            # EPIPE - radamsa exited early or was killed after hitting the size limit,
+            # whatever it wrote is still read in mutateBatch()
+            if e.errno != errno.EPIPE:
+                raise
+        process.stdin.close()
+
+    @staticmethod
+    def _readOutput(process, sizeLimit):
+        if sizeLimit == -1:
+            fuzzedOutput = process.stdout.read()
+        else:
+            # Don't buffer any more than we'll use, and stop radamsa
+            # rather than letting it keep generating
+            fuzzedOutput = process.stdout.read(sizeLimit)
+            if len(fuzzedOutput) == sizeLimit:
+                RadamsaPool._kill(process)
+        process.stdout.close()
+        process.wait()
+        return bytearray(fuzzedOutput)
+
+    # All inputs are handed out before any output is read, so the
+    # radamsa processes for a batch run concurrently
+    def mutateBatch(self, byteArrays, seed, sizeLimit=-1):
+        processes = self._acquire(seed, len(byteArrays))
+        writerThreads = []
+        for (process, byteArray) in zip(processes, byteArrays):
+            if len(byteArray) <= PIPE_SAFE_WRITE_SIZE:
+                self._writeInput(process, byteArray)
+            else:
+                # Radamsa starts writing output before it has read all of a large
+                # input, so feed it from a thread while we drain stdout below
+                writerThread = threading.Thread(target=self._writeInput, args=(process, byteArray))
+                writerThread.start()
+                writerThreads.append(writerThread)
+
+        fuzzedByteArrays = [self._readOutput(process, sizeLimit) for process in processes]
+        for writerThread in writerThreads:
+            writerThread.join()
+        return fuzzedByteArrays
+
+    def close(self):
+        with self._lock:
+            self._isClosed = True
+            self._wantedSeeds = []
+            processes = [process for seedProcesses in self._warm.values() for process in seedProcesses]
+            self._warm = {}
+        self._wakeEvent.set()
+        # Let the spawn thread exit before interpreter teardown pulls globals out from under it
+        self._thread.join(1.0)
+        for process in processes:
+            self._kill(process)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Fuzz case scheduling
+#
+# Each case's responses are reduced to a fingerprint (per inbound message:
+# length bucket, prefix, and response time bucket, plus how the case
+# ended), and a fingerprint never seen before means the case made the
+# target do something new.
+#
+# NoveltyScheduler (--guided) keeps novel cases, and later cases re-mutate
+# them instead of mutating the original messages, so effort goes to inputs
+# that change what the target does.  A case is identified by a chain of
+# seeds: the kept case's chain with
+# the new case's seed on the end.  Mutating the original data with each
+# seed in turn reproduces it, so crashes can still be replayed with
+# --parents and --range.  While fuzzing, each kept case's mutated data is
+# cached so re-mutating it costs a single mutation, not the whole chain.
+#
+# EnergyScheduler (--energy) picks which fuzzed subcomponent each case
+# mutates, weighted by how much each has yielded (new responses, crashes,
+# timeouts) per second spent fuzzing it.  The picks are logged and can be
+# replayed with --focus.
+#
+#------------------------------------------------------------------
+
+import random
+import time
+
+# Share of cases that re-mutate a kept case once there are any
+GUIDED_RATIO = 0.75
+# Response bytes that go into the fingerprint
+FINGERPRINT_PREFIX_LENGTH = 8
+# Longest seed chain kept, re-mutating too many times just makes noise
+MAX_CHAIN_LENGTH = 8
+# Most cases kept, the least productive are dropped beyond this
+MAX_KEPT_CASES = 1024
+# Cases with a fuzzed subcomponent larger than this aren't kept, since each
+# re-mutation tends to grow an input and a chain would keep growing it
+MAX_KEPT_SIZE = 4096
+
+# Share of energy-scheduled cases that mutate every fuzzed subcomponent at once
+ALL_TARGETS_RATIO = 0.1
+# Share of picks spread evenly over every subcomponent, so none are starved
+EXPLORE_RATIO = 0.1
+# How much a crash counts for compared to a new response or a timeout
+CRASH_YIELD = 10
+
+# Bucket a non-negative number to its power of two
+def _bucket(value):
+    return int(value).bit_length()
+
+# Tracks which response fingerprints have been seen
+class ResponseFingerprints(object):
+    def __init__(self):
+        self.fingerprints = set()
+        self._currentFeatures = []
+
+    def startCase(self):
+        self._currentFeatures = []
+
+    # Call for each inbound message received in the case
+    # elapsed - seconds spent waiting for it
+    def recordResponse(self, messageNumber, data, elapsed):
+        self._currentFeatures.append((messageNumber, _bucket(len(data)), str(data[:FINGERPRINT_PREFIX_LENGTH]), _bucket(elapsed * 1000)))
+
+    # outcome - name of the exception that ended the case, or None
+    # Returns True if the case's fingerprint hasn't been seen before
+    def finishCase(self, outcome):
+        fingerprint = (tuple(self._currentFeatures), outcome)
+        self._currentFeatures = []
+        if fingerprint in self.fingerprints:
+            return False
+        self.fingerprints.add(fingerprint)
+        return True
+
+class KeptCase(object):
+    def __init__(self, seedChain):
+        # Seeds applied in order to the original messages
+        self.seedChain = seedChain
+        self.timesPicked = 0
+        # Cases derived from this one that were novel in turn
+        self.novelChildren = 0
+        # Message number => (inputs, fuzzed outputs) for its fuzzed subcomponents
+        self.mutations = {}
+
+    # Cases that keep paying off get picked more, but every pick costs
+    def getWeight(self):
+        return (1.0 + self.novelChildren) / (1.0 + self.timesPicked)
+
+class NoveltyScheduler(object):
+    def __init__(self):
+        self.keptCases = []
+        self.responses = ResponseFingerprints()
+        self.guidedCount = 0
+        self.blindCount = 0
+        self._currentParent = None
+        self._currentMutations = {}
+        self._currentRunNumber = None
+        self._currentParentSeeds = ()
+
+    # Returns tuple of parent seeds to mutate with before the case's own seed
+    # Picks are random but seeded from runNumber, so a rerun that gets the same
+    # responses makes the same picks.  Repeating a run number (retrying after
+    # a failure) gives the same parents again.
+    def startCase(self, runNumber):
+        self.responses.startCase()
+        self._currentMutations = {}
+        if runNumber == self._currentRunNumber:
+            return self._currentParentSeeds
+        self._currentRunNumber = runNumber
+        self._currentParent = None
+        self._currentParentSeeds = ()
+        rng = random.Random(runNumber)
+        if not self.keptCases or rng.random() >= GUIDED_RATIO:
+            self.blindCount += 1
+            return ()
+        
+        pick = rng.uniform(0, sum(keptCase.getWeight() for keptCase in self.keptCases))
+        for keptCase in self.keptCases:
+            pick -= keptCase.getWeight()
+            if pick <= 0:
+                break
+        keptCase.timesPicked += 1
+        self._currentParent = keptCase
+        self._currentParentSeeds = keptCase.seedChain
+        self.guidedCount += 1
+        return keptCase.seedChain
+
+    # Returns copies of the parent case's fuzzed data for messageNumber, or None
+    # if there is no parent or its inputs were different (changed by a message
+    # processor), in which case the parent seeds have to be applied again
+    def getParentMutation(self, messageNumber, byteArrays):
+        if not self._currentParent or messageNumber not in self._currentParent.mutations:
+            return None
+        (inputs, outputs) = self._currentParent.mutations[messageNumber]
+        if inputs != map(str, byteArrays):
+            return None
+        return [bytearray(output) for output in outputs]
+
+    # Call with the inputs and fuzzed outputs of each fuzzed message in the case,
+    # kept with the case if it turns out to be novel
+    def recordMutation(self, messageNumber, byteArrays, fuzzedByteArrays):
+        self._currentMutations[messageNumber] = (map(str, byteArrays), map(str, fuzzedByteArrays))
+
+    def recordResponse(self, messageNumber, data, elapsed):
+        self.responses.recordResponse(messageNumber, data, elapsed)
+
+    # Call when the case is done
+    # seedChain - every seed the case was mutated with, () for the test run
+    # outcome - name of the exception that ended the case, or None
+    # Returns True if the case was kept for being novel
+    def finishCase(self, seedChain, outcome):
+        mutations = self._currentMutations
+        self._currentMutations = {}
+        if not self.responses.finishCase(outcome):
+            return False
+        
+        if self._currentParent:
+            self._currentParent.novelChildren += 1
+        if len(seedChain) == 0 or len(seedChain) > MAX_CHAIN_LENGTH:
+            return False
+        for (inputs, outputs) in mutations.values():
+            if any(len(output) > MAX_KEPT_SIZE for output in outputs):
+                return False
+        keptCase = KeptCase(tuple(seedChain))
+        keptCase.mutations = mutations
+        self.keptCases.append(keptCase)
+        if len(self.keptCases) > MAX_KEPT_CASES:
+            # Drop whichever has been least worth picking
+            self.keptCases.remove(min(self.keptCases, key=lambda keptCase: keptCase.getWeight()))
+        return True
+
+    def getReport(self):
+        totalCount = self.guidedCount + self.blindCount
+        guidedPercentage = 100.0 * self.guidedCount / totalCount if totalCount else 0.0
+        return ["%d distinct responses, %d novel cases kept" % (len(self.responses.fingerprints), len(self.keptCases)),
+                "%d of %d cases re-mutated a novel case (%.2f%%)" % (self.guidedCount, totalCount, guidedPercentage)]
+
+# A fuzzed subcomponent and what fuzzing it has achieved so far
+class FuzzTarget(object):
+    def __init__(self, messageNumber, subcomponentNumber):
+        self.messageNumber = messageNumber
+        self.subcomponentNumber = subcomponentNumber
+        self.caseCount = 0
+        # Seconds spent on cases fuzzing this, shared between targets when several are fuzzed
+        self.seconds = 0.0
+        self.novelCount = 0
+        self.crashCount = 0
+        self.timeoutCount = 0
+
+    def getName(self):
+        return "%d.%d" % (self.messageNumber, self.subcomponentNumber)
+
+    def getYield(self):
+        return self.novelCount + CRASH_YIELD * self.crashCount + self.timeoutCount
+
+class EnergyScheduler(object):
+    # targets - list of (messageNumber, subcomponentNumber) for every fuzzed subcomponent
+    def __init__(self, targets):
+        self.targets = [FuzzTarget(messageNumber, subcomponentNumber) for (messageNumber, subcomponentNumber) in targets]
+        self.responses = ResponseFingerprints()
+        self._currentRunNumber = None
+        self._currentTargets = []
+        self._currentFocus = None
+        self._startTime = 0
+
+    # Returns list of normalized weights, in the same order as self.targets
+    # Each target's rate is its yield per second, starting as if it had
+    # yielded once in one average case, so new targets get tried early
+    def getWeights(self):
+        totalCases = sum(target.caseCount for target in self.targets)
+        totalSeconds = sum(target.seconds for target in self.targets)
+        meanCaseSeconds = totalSeconds / totalCases if totalCases and totalSeconds else 1.0
+        rates = [(1.0 + target.getYield()) / (meanCaseSeconds + target.seconds) for target in self.targets]
+        totalRate = sum(rates)
+        return [(1 - EXPLORE_RATIO) * rate / totalRate + EXPLORE_RATIO / len(self.targets) for rate in rates]
+
+    # Returns set of (messageNumber, subcomponentNumber) to fuzz this case,
+    # or None to fuzz them all.  Repeating a run number gives the same set.
+    def startCase(self, runNumber):
+        self.responses.startCase()
+        self._startTime = time.time()
+        if runNumber == self._currentRunNumber:
+            return self._currentFocus
+        self._currentRunNumber = runNumber
+        rng = random.Random(runNumber)
+        if len(self.targets) == 1 or rng.random() < ALL_TARGETS_RATIO:
+            self._currentTargets = self.targets
+            self._currentFocus = None
+            return None
+        
+        pick = rng.random()
+        for (target, weight) in zip(self.targets, self.getWeights()):
+            pick -= weight
+            if pick <= 0:
+                break
+        self._currentTargets = [target]
+        self._currentFocus = set([(target.messageNumber, target.subcomponentNumber)])
+        return self._currentFocus
+
+    def recordResponse(self, messageNumber, data, elapsed):
+        self.responses.recordResponse(messageNumber, data, elapsed)
+
+    # Call when the case is done, credits whatever it yielded to the targets it fuzzed
+    # outcome - name of the exception that ended the case, or None
+    # isCrash - whether a crash was detected
+    def finishCase(self, outcome, isCrash):
+        seconds = (time.time() - self._startTime) / len(self._currentTargets)
+        isNovel = self.responses.finishCase(outcome)
+        for target in self._currentTargets:
+            target.caseCount += 1
+            target.seconds += seconds
+            if isNovel:
+                target.novelCount += 1
+            if isCrash:
+                target.crashCount += 1
+            if outcome == "timeout":
+                target.timeoutCount += 1
+        return isNovel
+
+    def getReport(self):
+        lines = ["%d distinct responses, per message.subcomponent:" % (len(self.responses.fingerprints))]
+        for (target, weight) in zip(self.targets, self.getWeights()):
+            lines.append("  %s: weight %.2f%%, %d cases in %.1f seconds, %d new responses, %d crashes, %d timeouts" % (target.getName(), 100.0 * weight, target.caseCount, target.seconds, target.novelCount, target.crashCount, target.timeoutCount))
+        return lines
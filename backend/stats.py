@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Fuzzing session statistics
+#
+# Holds counters for the session and prints them periodically and at
+# exit.  Other components can add their own lines to the report by
+# registering a function with addReporter().
+#
+#------------------------------------------------------------------
+
+import threading
+import time
+
+class Stats(object):
+    def __init__(self):
+        self.startTime = time.time()
+        # Counter name => value
+        self.counters = {}
+        # Functions returning a list of lines to add to each report
+        self._reporters = []
+        # Counters are updated from every worker thread
+        self._lock = threading.Lock()
+
+    # Returns the new value, which no other worker's increment() returns
+    def increment(self, counterName, amount=1):
+        with self._lock:
+            self.counters[counterName] = self.counters.get(counterName, 0) + amount
+            return self.counters[counterName]
+
+    # Add counters from elsewhere, such as other processes with --processes
+    def merge(self, counters):
+        with self._lock:
+            for (counterName, value) in counters.items():
+                self.counters[counterName] = self.counters.get(counterName, 0) + value
+
+    def get(self, counterName):
+        return self.counters.get(counterName, 0)
+
+    # Percentage of counterName over totalCounterName, 0 if nothing counted yet
+    def percentage(self, counterName, totalCounterName):
+        total = self.get(totalCounterName)
+        if total == 0:
+            return 0.0
+        return 100.0 * self.get(counterName) / total
+
+    def addReporter(self, reporter):
+        self._reporters.append(reporter)
+
+    def getReport(self):
+        elapsed = time.time() - self.startTime
+        cases = self.get("cases")
+        lines = ["%d cases in %.1f seconds (%.2f cases/sec)" % (cases, elapsed, cases / elapsed if elapsed > 0 else 0.0)]
+        for reporter in self._reporters:
+            lines.extend(reporter())
+        return lines
+
+    def printReport(self):
+        print "\n** Stats **"
+        for line in self.getReport():
+            print "\t%s" % (line)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Adaptive receive timeouts
+#
+# With --adaptiveTimeouts, the time each inbound message takes to arrive
+# is measured on unfuzzed runs (the test run and a baseline run every so
+# often), and fuzzed runs wait only a little longer than the slowest
+# usual response for each message, instead of receiveTimeout for all of
+# them.  Each case also gets a budget for all its receives together.
+#
+#------------------------------------------------------------------
+
+import math
+import os
+import threading
+from collections import deque
+
+# Timeouts are this percentile of the measured times...
+TIMEOUT_PERCENTILE = 95
+# ...times this, plus this many seconds
+TIMEOUT_MARGIN_FACTOR = 2.0
+TIMEOUT_MARGIN = 0.05
+# Only the latest measurements count, so timeouts follow the target's load
+MAX_SAMPLES = 100
+
+class LatencyModel(object):
+    # maxTimeout - no learned message timeout is longer than this (receiveTimeout)
+    def __init__(self, maxTimeout):
+        self.maxTimeout = maxTimeout
+        # Message number => deque of seconds its receive took
+        self._messageSamples = {}
+        # Seconds every receive in a run took together
+        self._caseSamples = deque(maxlen=MAX_SAMPLES)
+        # Timeouts read from a file, used until there are measurements
+        # Message number => seconds, "case" for the whole case
+        self._savedTimeouts = {}
+        # Unfuzzed runs measured
+        self.runCount = 0
+        # Recorded from every worker thread
+        self._lock = threading.Lock()
+
+    # Record one unfuzzed run, messageSeconds is message number => seconds its receive took
+    def recordRun(self, messageSeconds):
+        with self._lock:
+            for (messageNumber, seconds) in messageSeconds.items():
+                self._messageSamples.setdefault(messageNumber, deque(maxlen=MAX_SAMPLES)).append(seconds)
+            self._caseSamples.append(sum(messageSeconds.values()))
+            self.runCount += 1
+
+    @staticmethod
+    def _learn(samples):
+        samples = sorted(samples)
+        index = max(0, int(math.ceil(TIMEOUT_PERCENTILE / 100.0 * len(samples))) - 1)
+        return samples[index] * TIMEOUT_MARGIN_FACTOR + TIMEOUT_MARGIN
+
+    # Seconds to wait on inbound message messageNumber
+    def getTimeout(self, messageNumber):
+        with self._lock:
+            if messageNumber in self._messageSamples:
+                timeout = self._learn(self._messageSamples[messageNumber])
+            else:
+                timeout = self._savedTimeouts.get(messageNumber, self.maxTimeout)
+        return min(timeout, self.maxTimeout)
+
+    # Seconds all of a case's receives may take together, None if not learned yet
+    def getCaseTimeout(self):
+        with self._lock:
+            if self._caseSamples:
+                return self._learn(self._caseSamples)
+            return self._savedTimeouts.get("case")
+
+    def getTimeouts(self):
+        with self._lock:
+            messageNumbers = sorted(set(self._messageSamples.keys()) | set(key for key in self._savedTimeouts.keys() if key != "case"))
+        return [(messageNumber, self.getTimeout(messageNumber)) for messageNumber in messageNumbers]
+
+    def getReport(self):
+        caseTimeout = self.getCaseTimeout()
+        if caseTimeout is None:
+            return ["No receive timeouts learned yet"]
+        messageTimeouts = ", ".join("message %d %.3fs" % (messageNumber, timeout) for (messageNumber, timeout) in self.getTimeouts())
+        return ["Receive timeouts learned from %d unfuzzed runs: %s, whole case %.3fs" % (self.runCount, messageTimeouts, caseTimeout)]
+
+    # Use timeouts saved by an earlier run until there are measurements
+    def readFromFile(self, filePath):
+        savedTimeouts = {}
+        with open(filePath, "r") as timeoutFile:
+            for line in timeoutFile:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                (key, seconds) = line.split()
+                savedTimeouts[key if key == "case" else int(key)] = float(seconds)
+        with self._lock:
+            self._savedTimeouts = savedTimeouts
+
+    def writeToFile(self, filePath):
+        caseTimeout = self.getCaseTimeout()
+        if caseTimeout is None:
+            return
+        # Other processes may be reading it, so replace it in one step
+        temporaryPath = "%s.%d" % (filePath, os.getpid())
+        with open(temporaryPath, "w") as timeoutFile:
+            timeoutFile.write("# Receive timeouts learned by --adaptiveTimeouts, in seconds\n")
+            timeoutFile.write("case %f\n" % (caseTimeout))
+            for (messageNumber, timeout) in self.getTimeouts():
+                timeoutFile.write("%d %f\n" % (messageNumber, timeout))
+        os.rename(temporaryPath, filePath)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# PACKET_TX_RING sending for L2raw
+#
+# With txRingBatch set, L2raw frames are copied into a ring shared with the
+# kernel (PACKET_MMAP, TPACKET_V2) rather than sent one send() each, and
+# the kernel is told to send everything queued once txRingBatch frames are
+# waiting, before anything is received, and at exit.  PacketTxRing stands
+# in for the socket, so the drivers' sendto() goes into the ring.
+#
+# Normally the kernel sends a ring frame without copying it and marks its
+# slot free once the interface is done with it.  Loopback and veth mark it
+# free as soon as they take the frame, while it's still waiting to be read,
+# so the next frame in that slot would overwrite it.  Every frame is given
+# a virtio-net header (PACKET_VNET_HDR) saying the whole frame is header,
+# which has the kernel copy it out of the ring, so a free slot is never
+# still in use on any interface.  Received frames come with the header too,
+# and recv()/recvfrom() take it off.
+#
+# Linux only.
+#
+#------------------------------------------------------------------
+
+import errno
+import fcntl
+import mmap
+import socket
+import struct
+
+# From linux/if_packet.h
+SOL_PACKET = 263
+PACKET_VERSION = 10
+PACKET_TX_RING = 13
+PACKET_LOSS = 14
+PACKET_VNET_HDR = 15
+TPACKET_V2 = 1
+TPACKET_ALIGNMENT = 16
+TP_STATUS_AVAILABLE = 0
+TP_STATUS_SEND_REQUEST = 1
+# Frame data starts after the aligned struct tpacket2_hdr
+TPACKET2_DATA_OFFSET = 32
+# From linux/sockios.h
+SIOCGIFMTU = 0x8921
+
+# Ethernet header with a VLAN tag, on top of the interface's MTU
+MAX_L2_HEADER = 18
+
+# tp_status and tp_len
+_UINT = struct.Struct("I")
+# struct virtio_net_hdr: flags, gso_type, hdr_len, gso_size, csum_start,
+# csum_offset, hdr_len in the host's byte order
+_VNET_HDR = struct.Struct("=BBHHHH")
+
+def _roundUp(value, multiple):
+    return (value + multiple - 1) / multiple * multiple
+
+class PacketTxRing(object):
+    # connection - AF_PACKET socket, bound to interfaceName
+    # batchSize - frames to queue before the kernel sends them
+    def __init__(self, connection, interfaceName, batchSize):
+        # Reading from it directly doesn't send what's queued
+        self.rawSocket = connection
+        self.type = connection.type
+        # The drivers call these for every frame, so skip __getattr__()
+        self.gettimeout = connection.gettimeout
+        self.settimeout = connection.settimeout
+        self.setblocking = connection.setblocking
+        self.batchSize = batchSize
+        # Every send() goes through the ring once there is one, so each slot
+        # has to fit the biggest frame the interface can send
+        mtu = struct.unpack("16sI", fcntl.ioctl(connection.fileno(), SIOCGIFMTU, struct.pack("16sI", interfaceName, 0)))[1]
+        self.maxFrameLength = mtu + MAX_L2_HEADER
+        self._frameSize = _roundUp(TPACKET2_DATA_OFFSET + _VNET_HDR.size + self.maxFrameLength, TPACKET_ALIGNMENT)
+        self._blockSize = _roundUp(self._frameSize, mmap.PAGESIZE)
+        self._framesPerBlock = self._blockSize / self._frameSize
+        # Twice the batch, so one batch can be filled while the last is sent
+        self._frameCount = _roundUp(2 * batchSize, self._framesPerBlock)
+        connection.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V2)
+        # Has to be set before there's a ring
+        connection.setsockopt(SOL_PACKET, PACKET_VNET_HDR, 1)
+        # Drop frames the kernel won't send (too short, etc) rather than stopping
+        connection.setsockopt(SOL_PACKET, PACKET_LOSS, 1)
+        blockCount = self._frameCount / self._framesPerBlock
+        connection.setsockopt(SOL_PACKET, PACKET_TX_RING, struct.pack("IIII", self._blockSize, blockCount, self._frameSize, self._frameCount))
+        self._ring = mmap.mmap(connection.fileno(), self._blockSize * blockCount, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        # Frames don't cross blocks, so any space at the end of a block is skipped
+        self._frameOffsets = [frame / self._framesPerBlock * self._blockSize + frame % self._framesPerBlock * self._frameSize for frame in range(0, self._frameCount)]
+        self._nextFrame = 0
+        self._queuedCount = 0
+
+    # Have the kernel send every queued frame, waiting for them to go if isWait
+    def flush(self, isWait=False):
+        if self._ring is None:
+            return
+        if self._queuedCount or isWait:
+            self.rawSocket.send("", 0 if isWait else socket.MSG_DONTWAIT)
+            self._queuedCount = 0
+
+    # Queues data as the next frame, addr is ignored as the socket is bound
+    def sendto(self, data, addr):
+        if len(data) > self.maxFrameLength:
+            # Same as send() would for a frame too big for the interface
+            raise socket.error(errno.EMSGSIZE, "Message too long")
+        offset = self._frameOffsets[self._nextFrame]
+        # Still being sent from the last time round the ring
+        while _UINT.unpack_from(self._ring, offset)[0] != TP_STATUS_AVAILABLE:
+            self.flush(isWait=True)
+        # hdr_len of the whole frame, so the kernel copies all of it
+        _VNET_HDR.pack_into(self._ring, offset + TPACKET2_DATA_OFFSET, 0, 0, len(data), 0, 0, 0)
+        # buffer() so a bytearray is written without making a str of it first
+        self._ring.seek(offset + TPACKET2_DATA_OFFSET + _VNET_HDR.size)
+        self._ring.write(buffer(data))
+        _UINT.pack_into(self._ring, offset + 4, _VNET_HDR.size + len(data))
+        # Status last, the kernel may take the frame as soon as it's set
+        _UINT.pack_into(self._ring, offset, TP_STATUS_SEND_REQUEST)
+        self._nextFrame = (self._nextFrame + 1) % self._frameCount
+        self._queuedCount += 1
+        if self._queuedCount >= self.batchSize:
+            self.flush()
+        return len(data)
+
+    def send(self, data):
+        return self.sendto(data, None)
+
+    # Anything received must be in response to what's been queued, so send it first
+    def recvfrom(self, size):
+        if self._queuedCount:
+            self.flush(isWait=True)
+        (data, addr) = self.rawSocket.recvfrom(_VNET_HDR.size + size)
+        return (data[_VNET_HDR.size:], addr)
+
+    def recv(self, size, flags=0):
+        if self._queuedCount:
+            self.flush(isWait=True)
+        return self.rawSocket.recv(_VNET_HDR.size + size, flags)[_VNET_HDR.size:]
+
+    def close(self):
+        if self._ring is not None:
+            self.flush(isWait=True)
+            self._ring.close()
+            self._ring = None
+        self.rawSocket.close()
+
+    # Everything else (settimeout, setblocking, fileno, ...) is the socket's
+    def __getattr__(self, name):
+        return getattr(self.rawSocket, name)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# November 2014, created within ASIG
+# Author James Spadaro (jaspadar)
+# Co-Author Lilith Wyatt (liwyatt)
+#------------------------------------------------------------------
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the Cisco Systems, Inc. nor the
+#    names of its contributors may be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS "AS IS" AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#------------------------------------------------------------------
+#
+# Concurrent fuzzing workers
+#
+# With --workers N, N threads each run their own conversation with the
+# target at once.  Every worker has its own copy of the .fuzzer's
+# messages (they're altered in place while fuzzing), its own processor
+# instances and its own logger state, and takes run numbers from a
+# shared RunAllocator so no seed is run twice.
+#
+#------------------------------------------------------------------
+
+import threading
+from copy import copy, deepcopy
+
+# Everything a worker changes while running a case
+class FuzzWorker(object):
+    def __init__(self, workerNumber, fuzzerData, logger, messageProcessor, exceptionProcessor):
+        self.workerNumber = workerNumber
+        self.fuzzerData = fuzzerData
+        self.logger = logger
+        self.messageProcessor = messageProcessor
+        self.exceptionProcessor = exceptionProcessor
+        # Connection left open by the last case with reuseConnection, and its address
+        self.connection = None
+        self.connectionAddr = None
+        # Socket connecting for the next case with --preconnect, and the
+        # seed preConnect() was called for before starting it (None if any
+        # case can use it)
+        self.warmConnection = None
+        self.warmConnectionSeed = None
+        # Responses are read into this, grown as needed and kept between cases
+        self.receiveBuffer = bytearray()
+
+    # Returns a new worker with its own copy of everything, sharing only the
+    # log folder.  Processors are created fresh from their classes.
+    def createSibling(self, workerNumber, messageProcessorClass, exceptionProcessorClass):
+        logger = None
+        if self.logger:
+            logger = copy(self.logger)
+            logger.resetForNewRun()
+        return FuzzWorker(workerNumber, deepcopy(self.fuzzerData), logger, messageProcessorClass(), exceptionProcessorClass())
+
+# Hands out run numbers in order to any number of workers
+class RunAllocator(object):
+    # firstRunNumber - first run number handed out after the test run
+    # lastRunNumber - last run number handed out, -1 for no limit
+    # testRunNumber - run number handed out before any other, and finished
+    #   before anything else is handed out, None if there's no test run
+    # stride - gap between run numbers handed out, leaving the ones in
+    #   between to other processes (see --processes)
+    def __init__(self, firstRunNumber, lastRunNumber=-1, testRunNumber=None, stride=1):
+        self.firstRunNumber = firstRunNumber
+        self.lastRunNumber = lastRunNumber
+        self.testRunNumber = testRunNumber
+        self.stride = stride
+        self._nextRunNumber = firstRunNumber if testRunNumber is None else testRunNumber
+        self._inFlight = set()
+        self._lock = threading.Lock()
+        self._testRunFinishedEvent = threading.Event()
+        if testRunNumber is None:
+            self._testRunFinishedEvent.set()
+
+    # Returns the next run number to run, or None once past lastRunNumber
+    # finishedRunNumber - run number the caller just finished, if any
+    def getNext(self, finishedRunNumber=None):
+        with self._lock:
+            if finishedRunNumber is not None:
+                self._finish(finishedRunNumber)
+            if self._nextRunNumber == self.testRunNumber:
+                return self._take()
+        # Wait with a timeout, an untimed wait can't be interrupted by CTRL+C
+        while not self._testRunFinishedEvent.wait(0.5):
+            pass
+        with self._lock:
+            return self._take()
+
+    # Whether getNext() would return without waiting on the test run
+    def isReady(self):
+        with self._lock:
+            return self._testRunFinishedEvent.isSet() or self._nextRunNumber == self.testRunNumber
+
+    def _finish(self, runNumber):
+        self._inFlight.discard(runNumber)
+        if runNumber == self.testRunNumber:
+            self._testRunFinishedEvent.set()
+
+    def _take(self):
+        runNumber = self._nextRunNumber
+        if self._isPastLast(runNumber):
+            return None
+        self._nextRunNumber = self._getFollowing(runNumber)
+        self._inFlight.add(runNumber)
+        return runNumber
+
+    def _getFollowing(self, runNumber):
+        if runNumber == self.testRunNumber:
+            return self.firstRunNumber
+        return runNumber + self.stride
+
+    def _isPastLast(self, runNumber):
+        return runNumber != self.testRunNumber and self.lastRunNumber >= 0 and runNumber > self.lastRunNumber
+
+    # Run numbers handed out and not yet finished
+    def getInFlight(self):
+        with self._lock:
+            return sorted(self._inFlight)
+
+    # Run numbers in flight plus the next count to be handed out
+    def getUpcoming(self, count):
+        with self._lock:
+            upcoming = sorted(self._inFlight)
+            runNumber = self._nextRunNumber
+        for _ in range(0, count):
+            if self._isPastLast(runNumber):
+                break
+            upcoming.append(runNumber)
+            runNumber = self._getFollowing(runNumber)
+        return upcoming
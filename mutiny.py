@@ -37,28 +37,53 @@
 
 import datetime
 import errno
+import glob
 import imp
 import os.path
 import os
+import select
 import signal
 import socket
-import subprocess
 import sys
 import threading
 import time
+import traceback
 import argparse
+import atexit
 import ssl
 from copy import deepcopy
 from backend.proc_director import ProcDirector
 from backend.fuzzer_types import Message, MessageCollection, Logger
-from backend.packets import PROTO,IP
+from backend.packets import PROTO,ETH_P_ALL,IPHeaderTemplate
+from backend.txring import PacketTxRing
+from backend.connections import ConnectionFactory, isWarmConnectionUsable
+from backend.inproc import InProcessConnection, loadInProcessTarget
 from mutiny_classes.mutiny_exceptions import *
-from mutiny_classes.message_processor import MessageProcessorExtraParams
+from mutiny_classes.message_processor import MessageProcessor, MessageProcessorExtraParams
 from backend.fuzzerdata import FuzzerData
 from backend.menu_functions import validateNumberRange
+from backend.radamsa import RadamsaPool
+from backend.mutators import NativeMutator
+from backend.dictionary import TokenDictionary
+from backend.corpus import MutationCorpus, generateCorpus
+from backend.dedup import DuplicateCaseFilter
+from backend.stats import Stats
+from backend.scheduler import NoveltyScheduler, EnergyScheduler
+from backend.timeouts import LatencyModel
+from backend.pacing import RateController, SLOT_POLL_SECONDS
+from backend.workers import FuzzWorker, RunAllocator
+from backend.processes import ProcessCoordinator
+from backend.campaign import SeedLeaser, CampaignServer, CampaignClient, LeasedRunAllocator, DEFAULT_BIND_ADDRESS
+from backend.driver import Return, Connect, StartTls, Send, Receive, ReceiveInto, Sleep, runBlocking, EventLoop
 
 # Path to Radamsa binary
 RADAMSA=os.path.abspath( os.path.join(__file__, "../radamsa-0.3/bin/radamsa") )
+# How many upcoming seeds to keep radamsa processes spawned ahead for
+RADAMSA_SEEDS_AHEAD=4
+# Print stats every this many fuzz cases
+STATS_INTERVAL=1000
+# With --adaptiveTimeouts, re-measure response times with an unfuzzed run every this many fuzz cases
+BASELINE_INTERVAL=500
 # Whether to print debug info
 DEBUG_MODE=False
 # Test number to start from, 0 default
@@ -69,15 +94,33 @@ MAX_RUN_NUMBER=-1
 SEED_LOOP = []
 # For dumpraw option, dump into log directory by default, else 'dumpraw'
 DUMPDIR = ""
+# Protocols whose connection can be kept open between cases with reuseConnection
+REUSABLE_PROTOS = ["tcp", "tls", "udp"]
+
+# Whether proto is sent over a raw IP socket: a name from PROTO or a protocol number
+def isRawIpProto(proto):
+    return (proto in PROTO and proto not in ["tcp", "udp"]) or proto.isdigit()
+
+def getIpProtoNumber(proto):
+    return PROTO[proto] if proto in PROTO else int(proto)
+
+# Whether proto uses a raw socket (IP or L2)
+# These aren't connected to anything, so one is kept for the whole session
+def isRawProto(proto):
+    return isRawIpProto(proto) or proto == "L2raw"
 
 # Takes a socket and outbound data packet (byteArray), sends it out.
 # If debug mode is enabled, we print out the raw bytes
+# Like performRun(), this is a generator run by a backend.driver driver
 def sendPacket(connection, addr, outPacketData):
-    connection.settimeout(fuzzerData.receiveTimeout)
-    if connection.type == socket.SOCK_STREAM:
-        connection.send(outPacketData)
+    packetData = outPacketData
+    if ipHeaderTemplate:
+        # rawIpHeader, the socket takes the whole IP packet
+        packetData = ipHeaderTemplate.build(outPacketData)
+    if isinstance(connection, InProcessConnection):
+        connection.send(packetData)
     else:
-        connection.sendto(outPacketData,addr)
+        yield Send(connection, packetData, addr, fuzzerData.receiveTimeout)
 
     print "\tSent %d byte packet" % (len(outPacketData))
     if DEBUG_MODE:
@@ -85,131 +128,251 @@ def sendPacket(connection, addr, outPacketData):
         print "\tRaw Bytes: %s" % (Message.serializeByteArray(outPacketData))
 
 
-def receivePacket(connection, addr, bytesToRead):
-    readBufSize = 4096
-    connection.settimeout(fuzzerData.receiveTimeout)
+# timeout - seconds to wait for the response to start arriving
+# receiveBuffer - bytearray of at least getReceiveBufferSize(bytesToRead) to read into
+def receivePacket(connection, addr, bytesToRead, timeout, receiveBuffer):
+    readBufSize = getReceiveBufferSize(bytesToRead)
 
-    if connection.type == socket.SOCK_STREAM or connection.type == socket.SOCK_DGRAM:
-        response = bytearray(connection.recv(readBufSize))
+    if isinstance(connection, InProcessConnection):
+        # Whatever the target returned, no waiting
+        response = connection.receive()
+    elif connection.type == socket.SOCK_STREAM:
+        # The response may arrive in several segments, read until we have as
+        # much as expected (or the target stops sending) rather than one recv()
+        view = memoryview(receiveBuffer)[:readBufSize]
+        gapTimeout = fuzzerData.receiveGapTimeout if fuzzerData.receiveGapTimeout >= 0 else timeout
+        receivedCount = yield ReceiveInto(connection, view, max(bytesToRead, 1), timeout, gapTimeout)
+        response = bytearray(view[:receivedCount])
+    elif connection.type == socket.SOCK_DGRAM:
+        # A datagram is a whole message
+        response = bytearray((yield Receive(connection, readBufSize, timeout)))
     else:
-        response = bytearray(connection.recvfrom(readBufSize,addr))
-    
+        response = bytearray((yield Receive(connection, readBufSize, timeout, isRecvFrom=True, addr=addr)))
     
     if len(response) == 0:
         # If 0 bytes are recv'd, the server has closed the connection
         # per python documentation
         raise ConnectionClosedException("Server has closed the connection")
-    if bytesToRead > readBufSize:
-        # If we're trying to read > 4096, don't actually bother trying to guarantee we'll read 4096
-        # Just keep reading in 4096 chunks until we should have read enough, and then return
-        # whether or not it's as much data as expected
-        i = readBufSize
-        while i < bytesToRead:
-            response += bytearray(connection.recv(readBufSize))
-            i += readBufSize
             
     print "\tReceived %d bytes" % (len(response))
     if DEBUG_MODE:
         print "\tReceived: %s" % (response)
-    return response
+    raise Return(response)
 
-# Perform a fuzz run.  
-# If seed is -1, don't perform fuzzing (test run)
-def performRun(fuzzerData, host, logger, messageProcessor, seed=-1):
-    # Before doing anything, set up logger
-    # Otherwise, if connection is refused, we'll log last, but it will be wrong
-    if logger != None:
-        logger.resetForNewRun()
-    
-    # We don't perform DNS resolution, but always automatically type "localhost"
-    # ... really need to go ahead and add DNS resolution soon
-    if host == "localhost":
-        host = "127.0.0.1"
-    
-    # cheap testing for ipv6/ipv4/unix
-    # don't think it's worth using regex for this, since the user
-    # will have to actively go out of their way to subvert this.
-    if "." in host:
-        socket_family = socket.AF_INET
-        addr = (host,fuzzerData.port)
-    elif ":" in host:
-        socket_family = socket.AF_INET6 
-        addr = (host,fuzzerData.port)
+# Most that one receivePacket() reads when expecting a response of bytesToRead
+def getReceiveBufferSize(bytesToRead):
+    return max(bytesToRead, 4096)
+
+# Fuzz the given subcomponents of message number messageNumber with seed
+# Returns list of fuzzed bytearrays, from the corpus where possible
+def mutateSubcomponents(messageNumber, subcomponentNumbers, byteArrays, seed, sizeLimit):
+    if mutationCorpus:
+        # Has None for any not pregenerated for this seed or whose input was altered
+        fuzzedByteArrays = mutationCorpus.getBatch(messageNumber, subcomponentNumbers, seed, byteArrays, sizeLimit)
     else:
-        socket_family = socket.AF_UNIX
-        addr = (host)
+        fuzzedByteArrays = [None] * len(byteArrays)
+    missing = filter(lambda k: fuzzedByteArrays[k] is None, range(0, len(byteArrays)))
+    if len(missing) > 0:
+        mutated = mutator.mutateBatch(map(lambda k: byteArrays[k], missing), seed, sizeLimit)
+        for (k, fuzzedByteArray) in zip(missing, mutated):
+            fuzzedByteArrays[k] = fuzzedByteArray
+    return fuzzedByteArrays
 
-    #just in case filename is like "./asdf" !=> AF_INET
-    if "/" in host:
-        socket_family = socket.AF_UNIX
-        addr = (host)
-    
-    # Call messageprocessor preconnect callback if it exists
-    try:
-        messageProcessor.preConnect(seed, host, fuzzerData.port) 
-    except AttributeError:
-        pass
-    
+# Create a socket for fuzzerData.proto to host and connect it if needed
+# With --preconnect, takes worker's pre-connected socket if it has one and
+# starts connecting another for its next case, calling preConnect() for
+# that case first
+# A generator like performRun(), returns (connection, addr)
+def openConnection(fuzzerData, host, worker=None):
     # for TCP/UDP/RAW support
-    if fuzzerData.proto == "tcp":
-        connection = socket.socket(socket_family,socket.SOCK_STREAM)
-        # Don't connect yet, until after we do any binding below
-    elif fuzzerData.proto == "tls":
-        try:
-            _create_unverified_https_context = ssl._create_unverified_context
-        except AttributeError:
-            # Legacy Python that doesn't verify HTTPS certificates by default
-            pass
-        else:
-            # Handle target environment that doesn't support HTTPS verification
-            ssl._create_default_https_context = _create_unverified_https_context
-        tcpConnection = socket.socket(socket_family,socket.SOCK_STREAM)
-        connection = ssl.wrap_socket(tcpConnection)
-        # Don't connect yet, until after we do any binding below
-    elif fuzzerData.proto == "udp":
-        connection = socket.socket(socket_family,socket.SOCK_DGRAM)
+    if fuzzerData.proto == "tcp" or fuzzerData.proto == "tls" or fuzzerData.proto == "udp":
+        connection = None
+        if worker and worker.warmConnection:
+            # Started connecting during the worker's last case
+            if isWarmConnectionUsable(worker.warmConnection):
+                connection = worker.warmConnection
+                stats.increment("preconnectedConnections")
+            else:
+                worker.warmConnection.close()
+            worker.warmConnection = None
+        if connection is None:
+            connection = connectionFactory.create()
+        addr = connectionFactory.addr
     # PROTO = dictionary of assorted L3 proto => proto number
-    # e.g. "icmp" => 1
-    elif fuzzerData.proto in PROTO:
-        connection = socket.socket(socket_family,socket.SOCK_RAW,PROTO[fuzzerData.proto]) 
-        if fuzzerData.proto != "raw":
-            connection.setsockopt(socket.IPPROTO_IP,socket.IP_HDRINCL,0)
-        addr = (host,0)
+    # e.g. "icmp" => 1, or the number itself
+    elif isRawIpProto(fuzzerData.proto):
+        addr = connectionFactory.addr
         try:
-            connection = socket.socket(socket_family,socket.SOCK_RAW,PROTO[fuzzerData.proto]) 
+            connection = socket.socket(connectionFactory.family,socket.SOCK_RAW,getIpProtoNumber(fuzzerData.proto)) 
         except Exception as e:
             print e
             print "Unable to create raw socket, please verify that you have sudo access"
             sys.exit(0)
+        # Otherwise the kernel adds the IP header
+        if fuzzerData.rawIpHeader:
+            connection.setsockopt(socket.IPPROTO_IP,socket.IP_HDRINCL,1)
     elif fuzzerData.proto == "L2raw":
-        connection = socket.socket(socket.AF_PACKET,socket.SOCK_RAW,0x0300)
+        # host is the interface to send on
+        # Only take in frames if the conversation has any to receive
+        l2Proto = ETH_P_ALL if doesConversationReceive else 0
+        addr = (host, l2Proto)
+        connection = socket.socket(socket.AF_PACKET,socket.SOCK_RAW,socket.htons(l2Proto))
+        connection.bind(addr)
+        if fuzzerData.txRingBatch:
+            connection = PacketTxRing(connection, host, fuzzerData.txRingBatch)
+            # Send whatever's left in the ring when the session ends
+            atexit.register(connection.close)
+    elif fuzzerData.proto == "inproc":
+        # Messages go straight to inprocTarget, nothing to connect to
+        connection = InProcessConnection(inprocTarget)
+        addr = None
     else:
-        addr = (host,0)
-        try:
-            #test if it's a valid number 
-            connection = socket.socket(socket_family,socket.SOCK_RAW,int(fuzzerData.proto)) 
-            connection.setsockopt(socket.IPPROTO_IP,socket.IP_HDRINCL,0)
-        except Exception as e:
-            print e
-            print "Unable to create raw socket, please verify that you have sudo access"
-            sys.exit(0)
+        sys.exit("Unknown proto %s" % (fuzzerData.proto))
         
-    if fuzzerData.proto == "tcp" or fuzzerData.proto == "udp" or fuzzerData.proto == "tls":
-        # Specifying source port or address is only supported for tcp and udp currently
-        if fuzzerData.sourcePort != -1:
-            # Only support right now for tcp or udp, but bind source port address to something
-            # specific if requested
-            if fuzzerData.sourceIP != "" or fuzzerData.sourceIP != "0.0.0.0":
-                connection.bind((fuzzerData.sourceIP, fuzzerData.sourcePort))
-            else:
-                # User only specified a port, not an IP
-                connection.bind(('0.0.0.0', fuzzerData.sourcePort))
-        elif fuzzerData.sourceIP != "" and fuzzerData.sourceIP != "0.0.0.0":
-            # No port was specified, so 0 should auto-select
-            connection.bind((fuzzerData.sourceIP, 0))
     if fuzzerData.proto == "tcp" or fuzzerData.proto == "tls":
-        # Now that we've had a chance to bind as necessary, connect
-        connection.connect(addr)
+        # Finishes the connect if the socket was pre-connected
+        yield Connect(connection, addr)
+        if fuzzerData.proto == "tls":
+            handshakeStartTime = time.time()
+            connection = yield StartTls(connection, tlsContext)
+            stats.increment("tlsHandshakes")
+            stats.increment("tlsHandshakeSeconds", time.time() - handshakeStartTime)
+        if args.preconnect and worker:
+            # Only once this one is connected, so the target sees every
+            # connection in case order (one that serves a client at a time
+            # would otherwise be stuck on the next case's)
+            nextSeed = None
+            if hasPreConnectCallback:
+                # The callback still has to come before its case's connect
+                nextSeed = getNextRunSeed()
+                if nextSeed is not None:
+                    callPreConnect(worker.messageProcessor, nextSeed, host, fuzzerData.port)
+            if nextSeed is not None or not hasPreConnectCallback:
+                worker.warmConnection = connectionFactory.startConnecting()
+                worker.warmConnectionSeed = nextSeed
+
+    raise Return((connection, addr))
+
+# Call messageprocessor preconnect callback if it exists
+def callPreConnect(messageProcessor, seed, host, port):
+    try:
+        messageProcessor.preConnect(seed, host, port) 
+    except AttributeError:
+        pass
+
+# Seed of the run no worker has started yet that's handed out next,
+# None if there isn't one (the end of the range or of a leased block)
+def getNextRunSeed():
+    inFlight = runAllocator.getInFlight()
+    for runNumber in runAllocator.getUpcoming(1):
+        if runNumber not in inFlight and runNumber >= MIN_RUN_NUMBER:
+            return getSeedForRun(runNumber)
+    return None
+
+# Read and drop anything queued on a raw socket kept from an earlier case
+# A raw socket sees every packet of its protocol, so there's usually some
+# Returns False if it can't be used again (closed when a case ended early)
+def discardPending(connection):
+    if isinstance(connection, PacketTxRing):
+        # Frames the last case queued stay batched with this case's
+        connection = connection.rawSocket
+    try:
+        # Without changing the socket's timeout, which the drivers keep track of
+        while len(select.select([connection], [], [], 0)[0]) > 0:
+            connection.recv(65535)
+    except (select.error, socket.error):
+        return False
+    return True
+
+# Whether a connection kept from an earlier case can't be used again:
+# there's something to read (or the server closed it) before we've sent anything
+def isConnectionStale(connection):
+    if isinstance(connection, ssl.SSLSocket) and connection.pending():
+        return True
+    try:
+        return len(select.select([connection], [], [], 0)[0]) > 0
+    except (select.error, socket.error):
+        return True
+
+# Perform a fuzz run.  
+# This is a generator that yields its socket operations, run it with
+# backend.driver's runBlocking() or EventLoop
+# If seed is -1, don't perform fuzzing (test run)
+# checkDuplicates - skip the case with DuplicateCaseException if the same
+#   outbound data has been sent before (only if --skipDuplicates is set)
+# parentSeeds - seeds to mutate with, in order, before seed
+#   (re-mutating a case the scheduler kept)
+# focus - set of (messageNumber, subcomponentNumber) to fuzz, None fuzzes
+#   every fuzzed subcomponent
+# worker - FuzzWorker to keep the connection open on between cases, if
+#   the .fuzzer sets reuseConnection
+# isBaseline - unfuzzed run between cases measuring response times, kept
+#   out of the schedulers' fingerprints
+def performRun(fuzzerData, host, logger, messageProcessor, seed=-1, checkDuplicates=True, parentSeeds=(), focus=None, worker=None, isBaseline=False):
+    # Before doing anything, set up logger
+    # Otherwise, if connection is refused, we'll log last, but it will be wrong
+    if logger != None:
+        logger.resetForNewRun()
+        logger.setParentSeeds(parentSeeds if seed > -1 else ())
+        logger.setFocus(focus if seed > -1 else None)
+    
+    # Hash of all outbound data so far, checked before sending the last fuzzed message
+    caseHash = None
+    # Its digest at that point, recorded once the case has run to the end
+    caseDigest = None
+    if duplicateFilter and checkDuplicates and seed > -1:
+        caseHash = duplicateFilter.newCase()
+    
+    # Callbacks have always been given "localhost" as 127.0.0.1
+    # (connectionFactory resolves the target, names with DNS)
+    if host == "localhost":
+        host = "127.0.0.1"
+    
+    # Seed preConnect() was called for during the last case, with --preconnect
+    preConnectedSeed = None
+    if worker:
+        preConnectedSeed = worker.warmConnectionSeed
+        worker.warmConnectionSeed = None
+        if worker.warmConnection and preConnectedSeed not in (None, seed):
+            # Started for a different case (this one's a retry)
+            worker.warmConnection.close()
+            worker.warmConnection = None
+    if preConnectedSeed != seed:
+        callPreConnect(messageProcessor, seed, host, fuzzerData.port)
+    
+    connection = None
+    # Whether the connection was kept from an earlier case and nothing has come back on it yet
+    isConnectionUnproven = False
+    if worker and worker.connection:
+        if isRawProto(fuzzerData.proto):
+            if discardPending(worker.connection):
+                (connection, addr) = (worker.connection, worker.connectionAddr)
+        elif isConnectionStale(worker.connection):
+            # Server closed it, or left data we didn't expect, since the last case
+            worker.connection.close()
+        else:
+            (connection, addr) = (worker.connection, worker.connectionAddr)
+            # Only a stream can have been dropped by the server, a udp
+            # socket failing to get a reply is just the target not replying
+            isConnectionUnproven = connection.type == socket.SOCK_STREAM
+            stats.increment("reusedConnections")
+        worker.connection = None
+    if connection is None:
+        (connection, addr) = yield openConnection(fuzzerData, host, worker)
+    if worker and isRawProto(fuzzerData.proto):
+        # Kept even if this case fails, nothing a case does can spoil it
+        (worker.connection, worker.connectionAddr) = (connection, addr)
+    stats.increment("connectionUses")
+
+    # With --adaptiveTimeouts, unfuzzed runs measure how long each response
+    # takes, and fuzzed runs only wait a little longer than usual
+    isLatencyMeasured = latencyModel and seed == -1
+    # Message number => seconds its receive took
+    receiveSeconds = {}
+    # Seconds left for all this case's receives together, None for no limit
+    caseReceiveBudget = None
+    if latencyModel and seed > -1:
+        caseReceiveBudget = latencyModel.getCaseTimeout()
 
     i = 0   
     for i in range(0, len(fuzzerData.messageCollection.messages)):
@@ -241,16 +404,31 @@ def performRun(fuzzerData, host, logger, messageProcessor, seed=-1):
                 prefuzz = messageProcessor.preFuzzProcess(actualSubcomponents[0], MessageProcessorExtraParams(i, -1, message.isFuzzed, originalSubcomponents, actualSubcomponents))
                 message.subcomponents[0].setAlteredByteArray(prefuzz)
 
+            # Now run the fuzzer on all fuzzed subcomponents of the message in one batch
+            fuzzedSubcomponentNumbers = filter(lambda j: message.subcomponents[j].isFuzzed and (focus is None or (i, j) in focus), range(0, len(message.subcomponents)))
             # Skip fuzzing for seed == -1
-            if seed > -1:
-                # Now run the fuzzer for each fuzzed subcomponent
-                for subcomponent in message.subcomponents:
-                    if subcomponent.isFuzzed:
-                        radamsa = subprocess.Popen([RADAMSA, "--seed", str(seed)], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                        byteArray = subcomponent.getAlteredByteArray()
-                        (fuzzedByteArray, error_output) = radamsa.communicate(input=byteArray)
-                        fuzzedByteArray = bytearray(fuzzedByteArray)
-                        subcomponent.setAlteredByteArray(fuzzedByteArray)
+            if seed > -1 and fuzzedSubcomponentNumbers:
+                byteArrays = map(lambda j: message.subcomponents[j].getAlteredByteArray(), fuzzedSubcomponentNumbers)
+                maxFuzzedSize = message.maxFuzzedSize if message.maxFuzzedSize != -1 else fuzzerData.maxFuzzedSize
+                # Read one byte past the max so we can tell when output was truncated
+                sizeLimit = maxFuzzedSize + 1 if maxFuzzedSize != -1 else -1
+                fuzzedByteArrays = None
+                if scheduler and parentSeeds:
+                    # Start from the parent's cached data rather than replaying its seeds
+                    fuzzedByteArrays = scheduler.getParentMutation(i, byteArrays)
+                if fuzzedByteArrays is None:
+                    fuzzedByteArrays = byteArrays
+                    for parentSeed in parentSeeds:
+                        fuzzedByteArrays = mutateSubcomponents(i, fuzzedSubcomponentNumbers, fuzzedByteArrays, parentSeed, sizeLimit)
+                fuzzedByteArrays = mutateSubcomponents(i, fuzzedSubcomponentNumbers, fuzzedByteArrays, seed, sizeLimit)
+                if scheduler:
+                    scheduler.recordMutation(i, byteArrays, fuzzedByteArrays)
+                stats.increment("mutations", len(fuzzedByteArrays))
+                for (j, fuzzedByteArray) in zip(fuzzedSubcomponentNumbers, fuzzedByteArrays):
+                    if maxFuzzedSize != -1 and len(fuzzedByteArray) > maxFuzzedSize:
+                        del fuzzedByteArray[maxFuzzedSize:]
+                        stats.increment("truncatedMutations")
+                    message.subcomponents[j].setAlteredByteArray(fuzzedByteArray)
             
             # Fuzzing has now been done if this message is fuzzed
             # Always call preSend() regardless for subcomponents if there are any
@@ -274,11 +452,59 @@ def performRun(fuzzerData, host, logger, messageProcessor, seed=-1):
                 with open(loc,"wb") as f:
                     f.write(repr(str(byteArrayToSend))[1:-1])
 
-            sendPacket(connection, addr, byteArrayToSend)
+            if caseHash:
+                duplicateFilter.addMessage(caseHash, i, byteArrayToSend)
+                # Anything past the last fuzzed message is the same every case, so this
+                # is the earliest point the whole case can be compared
+                if i == lastFuzzedMessageNumber:
+                    caseDigest = caseHash.digest()
+                    if duplicateFilter.isDuplicate(caseDigest):
+                        connection.close()
+                        raise DuplicateCaseException("Outbound data identical to an earlier case")
+
+            try:
+                yield sendPacket(connection, addr, byteArrayToSend)
+            except socket.error as e:
+                if isConnectionUnproven:
+                    connection.close()
+                    raise RetryCurrentRunException("Kept connection failed (%s), reconnecting" % (str(e)))
+                raise
         else: 
             # Receiving packet from server
             messageByteArray = message.getAlteredMessage()
-            data = receivePacket(connection,addr,len(messageByteArray))
+            receiveTimeout = fuzzerData.receiveTimeout
+            if latencyModel and seed > -1:
+                receiveTimeout = latencyModel.getTimeout(i)
+            if caseReceiveBudget is not None:
+                if caseReceiveBudget <= 0:
+                    connection.close()
+                    raise socket.timeout("Case took longer than the learned receive time for a whole case")
+                receiveTimeout = min(receiveTimeout, caseReceiveBudget)
+            # Reuse the worker's buffer rather than allocating one per response
+            receiveBufferSize = getReceiveBufferSize(len(messageByteArray))
+            if worker is None:
+                receiveBuffer = bytearray(receiveBufferSize)
+            else:
+                if len(worker.receiveBuffer) < receiveBufferSize:
+                    worker.receiveBuffer = bytearray(receiveBufferSize)
+                receiveBuffer = worker.receiveBuffer
+            receiveStartTime = time.time()
+            try:
+                data = yield receivePacket(connection,addr,len(messageByteArray),receiveTimeout,receiveBuffer)
+            except (socket.error, ConnectionClosedException) as e:
+                # The server may have dropped it between cases without us seeing
+                if isConnectionUnproven:
+                    connection.close()
+                    raise RetryCurrentRunException("Kept connection failed (%s), reconnecting" % (str(e)))
+                raise
+            isConnectionUnproven = False
+            receiveSeconds[i] = time.time() - receiveStartTime
+            if caseReceiveBudget is not None:
+                caseReceiveBudget -= receiveSeconds[i]
+            if scheduler and not isBaseline:
+                scheduler.recordResponse(i, data, time.time() - receiveStartTime)
+            if energyScheduler and not isBaseline:
+                energyScheduler.recordResponse(i, data, time.time() - receiveStartTime)
             if data == messageByteArray:
                 print "\tReceived expected response"
             if logger != None:
@@ -297,7 +523,20 @@ def performRun(fuzzerData, host, logger, messageProcessor, seed=-1):
 
         i += 1
     
-    connection.close()
+    if worker and isRawProto(fuzzerData.proto):
+        # Already kept on the worker
+        pass
+    elif worker and fuzzerData.reuseConnection and fuzzerData.proto in REUSABLE_PROTOS:
+        # Left open for the next case, if anything goes wrong before here it's dropped
+        (worker.connection, worker.connectionAddr) = (connection, addr)
+    else:
+        connection.close()
+    if isLatencyMeasured:
+        latencyModel.recordRun(receiveSeconds)
+    if caseDigest:
+        duplicateFilter.recordCase(caseDigest)
+    if rateController and receiveSeconds:
+        rateController.recordReceiveSeconds(sum(receiveSeconds.values()) / len(receiveSeconds))
 
 # Usage case
 if len(sys.argv) < 3:
@@ -309,18 +548,74 @@ epi = "==" * 24 + '\n'
 
 parser = argparse.ArgumentParser(description=desc,epilog=epi)
 parser.add_argument("prepped_fuzz", help="Path to file.fuzzer")
-parser.add_argument("target_host", help="Target to fuzz")
+parser.add_argument("target_host", help="Target to fuzz", nargs="?")
 parser.add_argument("-s","--sleeptime",help="Time to sleep between fuzz cases (float)",type=float,default=0)
 seed_constraint = parser.add_mutually_exclusive_group()
 seed_constraint.add_argument("-r", "--range", help="Run only the specified cases. Acceptable arg formats: [ X | X- | X-Y ], for integers X,Y") 
 seed_constraint.add_argument("-l", "--loop", help="Loop/repeat the given finite number range. Acceptible arg format: [ X | X-Y | X,Y,Z-Q,R | ...]")
 seed_constraint.add_argument("-d", "--dumpraw", help="Test single seed, dump to 'dumpraw' folder",type=int)
 
+parser.add_argument("--pregenerate", help="Don't fuzz, instead generate radamsa output for seeds X-Y into a corpus file using all cores")
+parser.add_argument("-m", "--mutator", help="Mutation engine to use, overrides the .fuzzer file", choices=["radamsa", "native"])
+parser.add_argument("--skipDuplicates", help="Skip cases whose outbound data was already sent this run or by earlier runs of this .fuzzer", action="store_true")
+parser.add_argument("-c", "--corpus", help="Corpus file to write with --pregenerate, or to read pregenerated mutations from when fuzzing")
+parser.add_argument("-g", "--guided", help="Spend most cases re-mutating earlier cases that got new kinds of responses from the target", action="store_true")
+parser.add_argument("--parents", help="Comma separated seeds to mutate with before each case's seed, to reproduce a case logged by --guided")
+parser.add_argument("-e", "--energy", help="Fuzz one subcomponent per case, picked by how much fuzzing each has yielded per second", action="store_true")
+parser.add_argument("-w", "--workers", help="Number of conversations to run with the target at once, each on its own seeds", type=int, default=1)
+parser.add_argument("--async", dest="isAsync", help="Run --workers conversations on one thread with non-blocking sockets instead of a thread each", action="store_true")
+parser.add_argument("--udpBatch", help="For proto udp, keep this many cases in flight on one thread, each on its own socket kept between cases (--workers N --async with reuseConnection)", type=int)
+parser.add_argument("--processes", help="Number of processes to fuzz with, each running every Nth seed", type=int, default=1)
+parser.add_argument("--serve", help="Don't fuzz, instead coordinate a campaign on this port, leasing blocks of --range to --coordinator workers", type=int)
+parser.add_argument("--serveAddress", help="Address for --serve to listen on, any worker that can reach it can lease runs and write logs", default=DEFAULT_BIND_ADDRESS)
+parser.add_argument("--blockSize", help="Run numbers per block leased out with --serve", type=int, default=1000)
+parser.add_argument("--coordinator", help="HOST:PORT of a --serve coordinator to lease run numbers from and send logs to")
+parser.add_argument("--preconnect", help="For proto tcp and tls, start connecting each worker's next case while the current one runs", action="store_true")
+parser.add_argument("--rate", help="Start at most this many cases per second, less while the target is slow to respond or failing, instead of --sleeptime", type=float)
+parser.add_argument("--concurrency", help="Run at most this many of the --workers' cases at once, less while the target is slow to respond or failing", type=int)
+parser.add_argument("--adaptiveTimeouts", help="Learn a receive timeout for each inbound message from unfuzzed runs, instead of waiting receiveTimeout for every one", action="store_true")
+parser.add_argument("--focus", help="Comma separated message.subcomponent numbers to fuzz, leaving the rest unfuzzed, to reproduce a case logged by --energy")
+
 verbosity = parser.add_mutually_exclusive_group()
 verbosity.add_argument("-q", "--quiet", help="Don't log the outputs",action="store_true")
 verbosity.add_argument("--logAll", help="Log all the outputs",action="store_true")
 
 args = parser.parse_args()
+if not args.target_host and not args.pregenerate and not args.serve:
+    parser.error("target_host is required unless using --pregenerate or --serve")
+if args.serve and (args.loop or args.dumpraw or args.coordinator):
+    parser.error("--serve can't be used with --loop, --dumpraw, or --coordinator")
+if args.coordinator and (args.range or args.dumpraw):
+    parser.error("--coordinator leases its run numbers and can't be used with --range or --dumpraw")
+if args.blockSize < 1:
+    parser.error("--blockSize must be at least 1")
+if args.guided and (args.dumpraw or args.parents):
+    parser.error("--guided picks its own parent seeds and can't be used with --dumpraw or --parents")
+if args.parents and args.dumpraw:
+    parser.error("--dumpraw doesn't re-mutate and can't be used with --parents")
+if args.energy and (args.dumpraw or args.focus or args.guided):
+    parser.error("--energy picks its own subcomponents to fuzz and can't be used with --dumpraw, --focus, or --guided")
+if args.udpBatch is not None:
+    if args.udpBatch < 1:
+        parser.error("--udpBatch must be at least 1")
+    if args.workers != 1:
+        parser.error("--udpBatch sets the number of workers and can't be used with --workers")
+    args.workers = args.udpBatch
+    args.isAsync = True
+if args.workers < 1:
+    parser.error("--workers must be at least 1")
+if args.workers > 1 and (args.dumpraw or args.guided or args.energy):
+    parser.error("--workers can't be used with --dumpraw, --guided, or --energy")
+if args.processes < 1:
+    parser.error("--processes must be at least 1")
+if args.processes > 1 and args.dumpraw:
+    parser.error("--processes can't be used with --dumpraw")
+if args.rate is not None and args.rate <= 0:
+    parser.error("--rate must be more than 0")
+if args.concurrency is not None and args.concurrency < 1:
+    parser.error("--concurrency must be at least 1")
+if args.sleeptime and (args.rate is not None or args.concurrency is not None):
+    parser.error("--sleeptime can't be used with --rate or --concurrency, they pace cases instead")
 
 #----------------------------------------------------
 # Set MIN_RUN_NUMBER and MAX_RUN_NUMBER when provided
@@ -349,10 +644,6 @@ if args.range:
 elif args.loop:
     SEED_LOOP = validateNumberRange(args.loop,True) 
 
-#Check for dependency binaries
-if not os.path.exists(RADAMSA):
-    sys.exit("Could not find radamsa in %s... did you build it?" % RADAMSA)
-
 #Logging options
 isReproduce = False
 logAll = False
@@ -364,6 +655,9 @@ elif args.logAll:
 
 
 outputDataFolderPath = os.path.join("%s_%s" % (os.path.splitext(fuzzerFilePath)[0], "logs"), datetime.datetime.now().strftime("%Y-%m-%d,%H%M%S"))
+if args.coordinator:
+    # Several workers may be started on one machine at once
+    outputDataFolderPath += "-%d" % (os.getpid())
 fuzzerFolder = os.path.abspath(os.path.dirname(fuzzerFilePath))
 
 ########## Declare variables for scoping, "None"s will be assigned below
@@ -377,6 +671,68 @@ fuzzerData = FuzzerData()
 print "Reading in fuzzer data from %s..." % (fuzzerFilePath)
 fuzzerData.readFromFile(fuzzerFilePath)
 
+if args.udpBatch:
+    if fuzzerData.proto != "udp":
+        sys.exit("--udpBatch only applies to proto udp, not %s" % (fuzzerData.proto))
+    # Each worker's socket, and so its source port, stays the same from case
+    # to case, and a reply arriving after its case is over gets the socket
+    # replaced rather than being taken as the next case's reply
+    fuzzerData.reuseConnection = True
+
+if args.mutator:
+    fuzzerData.mutator = args.mutator
+if fuzzerData.mutator not in ["radamsa", "native"]:
+    sys.exit("Unknown mutator %s, must be radamsa or native" % (fuzzerData.mutator))
+
+#Check for dependency binaries
+if fuzzerData.mutator == "radamsa" and not os.path.exists(RADAMSA):
+    sys.exit("Could not find radamsa in %s... did you build it?" % RADAMSA)
+
+if args.pregenerate:
+    (firstSeed, lastSeed) = getRunNumbersFromArgs(args.pregenerate)
+    if lastSeed < 0:
+        sys.exit("--pregenerate needs a finite seed range, such as 0-100000")
+    corpusPath = args.corpus if args.corpus else "%s.corpus" % (os.path.splitext(fuzzerFilePath)[0])
+    if os.path.exists(corpusPath):
+        sys.exit("Corpus file already exists: %s" % (corpusPath))
+    if fuzzerData.mutator != "radamsa":
+        sys.exit("--pregenerate is only supported with the radamsa mutator")
+    print "Pregenerating seeds %d-%d into %s..." % (firstSeed, lastSeed, corpusPath)
+    generateCorpus(corpusPath, RADAMSA, fuzzerData, firstSeed, lastSeed)
+    print "Wrote corpus, fuzz with it using --corpus %s" % (corpusPath)
+    exit()
+
+if args.serve:
+    leaser = SeedLeaser(MIN_RUN_NUMBER, MAX_RUN_NUMBER, args.blockSize)
+    # Worker logs go where this .fuzzer's logs would
+    try:
+        os.makedirs(outputDataFolderPath)
+    except OSError:
+        sys.exit("Unable to create logging directory: %s" % (outputDataFolderPath))
+    campaignServer = CampaignServer(args.serve, leaser, outputDataFolderPath, args.serveAddress)
+    print "Coordinating on %s port %d, collecting worker logs in %s" % (args.serveAddress, args.serve, outputDataFolderPath)
+    serverThread = threading.Thread(target=campaignServer.serve_forever)
+    serverThread.daemon = True
+    serverThread.start()
+    try:
+        # Sleep rather than join() so CTRL+C still gets through
+        while not leaser.isDone():
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print "\nSIGINT received, stopping\n"
+    campaignServer.shutdown()
+    print "\n** Stats **"
+    for line in leaser.getReport():
+        print "\t%s" % (line)
+    exit()
+
+mutationCorpus = None
+if args.corpus:
+    if fuzzerData.mutator != "radamsa":
+        sys.exit("Pregenerated corpora hold radamsa output and can only be used with the radamsa mutator")
+    mutationCorpus = MutationCorpus(args.corpus)
+    print "Using pregenerated mutations for seeds %d-%d from %s" % (mutationCorpus.firstSeed, mutationCorpus.lastSeed, args.corpus)
+
 ######## Processor Setup ################
 # The processor just acts as a container #
 # class that will import custom versions #
@@ -398,11 +754,6 @@ else:
 #Create class director, which import/overrides processors as appropriate
 procDirector = ProcDirector(processorDirectory)
 
-########## Launch child monitor thread
-    ### monitor.task = spawned thread
-    ### monitor.crashEvent = threading.Event()
-monitor = procDirector.startMonitor(host,fuzzerData.port)
-
 #! make it so logging message does not appear if reproducing (i.e. -r x-y cmdline arg is set)
 logger = None 
 
@@ -421,10 +772,224 @@ if args.dumpraw:
             print "Unable to create dumpraw dir"
             pass
     
+# Counters for the session, printed every STATS_INTERVAL cases and at exit
+stats = Stats()
+if fuzzerData.maxFuzzedSize != -1 or any(message.maxFuzzedSize != -1 for message in fuzzerData.messageCollection.messages):
+    stats.addReporter(lambda: ["Truncated %d of %d mutations to maxFuzzedSize (%.2f%%)" % (stats.get("truncatedMutations"), stats.get("mutations"), stats.percentage("truncatedMutations", "mutations"))])
+if fuzzerData.reuseConnection:
+    if fuzzerData.proto not in REUSABLE_PROTOS:
+        print "reuseConnection only applies to %s, connecting for every case" % (", ".join(REUSABLE_PROTOS))
+    stats.addReporter(lambda: ["Reused the connection for %d of %d runs (%.2f%%)" % (stats.get("reusedConnections"), stats.get("connectionUses"), stats.percentage("reusedConnections", "connectionUses"))])
+if args.preconnect:
+    stats.addReporter(lambda: ["Pre-connected the connection for %d of %d runs (%.2f%%)" % (stats.get("preconnectedConnections"), stats.get("connectionUses"), stats.percentage("preconnectedConnections", "connectionUses"))])
+
+# One TLS context for every connection, rather than setting one up per case
+# Certificates aren't verified, the target is usually using a self-signed one
+tlsContext = None
+if fuzzerData.proto == "tls":
+    tlsContext = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+    tlsContext.verify_mode = ssl.CERT_NONE
+    stats.addReporter(lambda: ["%d TLS handshakes took %.2f seconds (%.2f ms each)" % (stats.get("tlsHandshakes"), stats.get("tlsHandshakeSeconds"), 1000.0 * stats.get("tlsHandshakeSeconds") / max(1, stats.get("tlsHandshakes")))])
+
+# Callable every outbound message is passed to with proto inproc
+inprocTarget = None
+if fuzzerData.proto == "inproc":
+    if fuzzerData.inprocTarget == "none":
+        sys.exit("proto inproc needs an inprocTarget, module:function")
+    try:
+        inprocTarget = loadInProcessTarget(fuzzerData.inprocTarget, fuzzerFolder)
+    except Exception as e:
+        sys.exit("Unable to load inprocTarget %s: %s" % (fuzzerData.inprocTarget, str(e)))
+
+if fuzzerData.txRingBatch:
+    if fuzzerData.proto != "L2raw":
+        sys.exit("txRingBatch only applies to proto L2raw, not %s" % (fuzzerData.proto))
+    if not hasattr(socket, "AF_PACKET"):
+        sys.exit("txRingBatch needs Linux AF_PACKET sockets")
+doesConversationReceive = any(not message.isOutbound() for message in fuzzerData.messageCollection.messages)
+
+if args.preconnect:
+    if fuzzerData.proto not in ["tcp", "tls"]:
+        sys.exit("--preconnect only applies to proto tcp and tls, not %s" % (fuzzerData.proto))
+    if fuzzerData.sourcePort != -1:
+        # The next case's socket would need the port while this case has it
+        sys.exit("--preconnect can't be used with a sourcePort")
+
+# Resolves the target once for every case's connection
+connectionFactory = None
+if host and fuzzerData.proto not in ["L2raw", "inproc"]:
+    if fuzzerData.proto == "tcp" or fuzzerData.proto == "tls":
+        socketType = socket.SOCK_STREAM
+    elif fuzzerData.proto == "udp":
+        socketType = socket.SOCK_DGRAM
+    else:
+        socketType = socket.SOCK_RAW
+    try:
+        connectionFactory = ConnectionFactory(host, fuzzerData.port, socketType, fuzzerData.sourceIP, fuzzerData.sourcePort)
+    except socket.error as e:
+        sys.exit("Unable to resolve target %s: %s" % (host, str(e)))
+
+# With rawIpHeader, every packet's IP header is copied from one built here
+ipHeaderTemplate = None
+if fuzzerData.rawIpHeader and host:
+    if not isRawIpProto(fuzzerData.proto):
+        sys.exit("rawIpHeader only applies to raw IP protos, not %s" % (fuzzerData.proto))
+    try:
+        ipHeaderTemplate = IPHeaderTemplate(getIpProtoNumber(fuzzerData.proto), fuzzerData.sourceIP or "0.0.0.0", connectionFactory.addr[0])
+    except socket.error as e:
+        sys.exit("rawIpHeader needs IPv4 source and target addresses: %s" % (str(e)))
+
+# Fork here for --processes, before any threads or radamsa processes start
+# Each process fuzzes every Nth run number and logs to the same folder,
+# this one waits for them all and prints their combined stats
+processCoordinator = None
+processNumber = 0
+if args.processes > 1:
+    print "Fuzzing with %d processes" % (args.processes)
+    processCoordinator = ProcessCoordinator(args.processes)
+    processNumber = processCoordinator.run(isFirstSolo=fuzzerData.shouldPerformTestRun)
+    if processNumber is None:
+        stats.merge(processCoordinator.counters)
+        stats.printReport()
+        exit()
+    atexit.register(lambda: processCoordinator.reportStats(stats.counters))
+else:
+    atexit.register(stats.printReport)
+
+########## Launch child monitor thread
+    ### monitor.task = spawned thread
+    ### monitor.crashEvent = threading.Event()
+monitor = procDirector.startMonitor(host,fuzzerData.port)
 
 exceptionProcessor = procDirector.exceptionProcessor()
 messageProcessor = procDirector.messageProcessor()
 
+# Whether the processor does anything in preConnect(), which --preconnect
+# then has to call for a case before starting its connection
+# Processors copied from the base one keep its empty preConnect()
+preConnectCode = getattr(getattr(type(messageProcessor), "preConnect", None), "__code__", None)
+emptyPreConnectCode = MessageProcessor.preConnect.__code__
+hasPreConnectCallback = preConnectCode is not None and (preConnectCode.co_code, preConnectCode.co_consts) != (emptyPreConnectCode.co_code, emptyPreConnectCode.co_consts)
+if args.preconnect and hasPreConnectCallback and args.workers > 1:
+    # Which worker's case comes next isn't known in advance
+    sys.exit("--preconnect can't be used with more than one worker when the Message Processor has a preConnect()")
+
+dictionaryTokens = []
+if fuzzerData.dictionaryFile != "none":
+    dictionaryPath = os.path.join(fuzzerFolder, fuzzerData.dictionaryFile)
+    if fuzzerData.mutator != "native":
+        print "Radamsa does not support token dictionaries, ignoring %s (use --mutator native to use it)" % (dictionaryPath)
+    elif not os.path.isfile(dictionaryPath):
+        sys.exit("Could not find token dictionary %s" % (dictionaryPath))
+    else:
+        dictionaryTokens = TokenDictionary().readFromFile(dictionaryPath)
+        print "Loaded %d tokens from dictionary %s" % (len(dictionaryTokens), dictionaryPath)
+
+if fuzzerData.mutator == "native":
+    # Let the native mutator splice in data from anywhere in the conversation
+    mutator = NativeMutator(spliceSources=[message.getOriginalMessage() for message in fuzzerData.messageCollection.messages], dictionary=dictionaryTokens)
+else:
+    # One radamsa process is needed per fuzzed subcomponent for each seed
+    fuzzedSubcomponentCount = 0
+    for message in fuzzerData.messageCollection.messages:
+        if message.isOutbound():
+            fuzzedSubcomponentCount += len(filter(lambda subcomponent: subcomponent.isFuzzed, message.subcomponents))
+    mutator = RadamsaPool(RADAMSA, processesPerSeed=fuzzedSubcomponentCount)
+atexit.register(mutator.close)
+
+# Message number of the last fuzzed outbound message, where duplicate checks happen
+lastFuzzedMessageNumber = -1
+for messageNumber in range(0, len(fuzzerData.messageCollection.messages)):
+    message = fuzzerData.messageCollection.messages[messageNumber]
+    if message.isOutbound() and message.isFuzzed:
+        lastFuzzedMessageNumber = messageNumber
+
+duplicateFilter = None
+# Looping and dumpraw deliberately repeat seeds, so don't skip anything there
+if args.skipDuplicates and not args.loop and not args.dumpraw:
+    # Hashes are kept next to the .fuzzer so later campaigns can skip the same cases
+    # Sized for the range if there is one
+    expectedCount = MAX_RUN_NUMBER - MIN_RUN_NUMBER + 1 if MAX_RUN_NUMBER != -1 else None
+    seenPath = "%s.seen" % (os.path.splitext(fuzzerFilePath)[0])
+    # With --processes, each appends to its own store and loads everyone's
+    storePath = seenPath if processNumber == 0 else "%s.%d" % (seenPath, processNumber)
+    seenPaths = [seenPath] + filter(lambda path: path[len(seenPath)+1:].isdigit(), glob.glob("%s.*" % (seenPath)))
+    duplicateFilter = DuplicateCaseFilter(storePath, expectedCount, [path for path in seenPaths if path != storePath])
+    print "Skipping duplicate cases, %d hashes loaded from %s" % (duplicateFilter.storedCount, ", ".join(seenPaths))
+    atexit.register(duplicateFilter.close)
+    stats.addReporter(duplicateFilter.getReport)
+
+# Per message receive timeouts learned from unfuzzed runs
+latencyModel = None
+timeoutsPath = "%s.timeouts" % (os.path.splitext(fuzzerFilePath)[0])
+if args.adaptiveTimeouts:
+    latencyModel = LatencyModel(fuzzerData.receiveTimeout)
+    if os.path.isfile(timeoutsPath):
+        # Until the test run or a baseline run measures them again
+        latencyModel.readFromFile(timeoutsPath)
+        print "Loaded receive timeouts from %s" % (timeoutsPath)
+    stats.addReporter(latencyModel.getReport)
+
+# Paces cases with --rate and --concurrency instead of --sleeptime
+# Limits are for the whole session, so split between --processes
+rateController = None
+if args.rate is not None or args.concurrency is not None:
+    rateController = RateController(args.rate / args.processes if args.rate is not None else None, max(1, args.concurrency / args.processes) if args.concurrency is not None else None)
+    stats.addReporter(rateController.getReport)
+
+# Print and save the timeouts latencyModel has learned so far
+def reportLearnedTimeouts():
+    for line in latencyModel.getReport():
+        print line
+    latencyModel.writeToFile(timeoutsPath)
+
+# Unfuzzed run to measure response times for --adaptiveTimeouts
+# Doesn't log or count as a case, and failures are only printed
+def performBaselineRun(fuzzerData, messageProcessor, worker):
+    print "\n\nPerforming baseline run without fuzzing to measure response times..."
+    # A target serving one client at a time would hold the baseline back
+    # behind worker's connections until it timed out, so they're dropped
+    # (preConnect() stays called for the next case, which connects afresh)
+    if worker.connection and not isRawProto(fuzzerData.proto):
+        worker.connection.close()
+        worker.connection = None
+    if worker.warmConnection:
+        worker.warmConnection.close()
+        worker.warmConnection = None
+    try:
+        yield performRun(fuzzerData, host, None, messageProcessor, seed=-1, isBaseline=True)
+    except Exception as e:
+        if e.__class__ in MessageProcessorExceptions.all:
+            raise e
+        print "Baseline run failed: %s" % (str(e))
+    else:
+        reportLearnedTimeouts()
+
+# Response-novelty-guided scheduling, picks parent seeds for each case
+scheduler = None
+if args.guided:
+    scheduler = NoveltyScheduler()
+    stats.addReporter(scheduler.getReport)
+fixedParentSeeds = tuple(map(int, args.parents.split(","))) if args.parents else ()
+
+# Energy scheduling, picks which fuzzed subcomponents each case mutates
+fuzzTargets = []
+for messageNumber in range(0, len(fuzzerData.messageCollection.messages)):
+    message = fuzzerData.messageCollection.messages[messageNumber]
+    if message.isOutbound():
+        for subcomponentNumber in range(0, len(message.subcomponents)):
+            if message.subcomponents[subcomponentNumber].isFuzzed:
+                fuzzTargets.append((messageNumber, subcomponentNumber))
+energyScheduler = None
+if args.energy:
+    if not fuzzTargets:
+        sys.exit("--energy needs at least one fuzzed outbound message")
+    energyScheduler = EnergyScheduler(fuzzTargets)
+    stats.addReporter(energyScheduler.getReport)
+fixedFocus = None
+if args.focus:
+    fixedFocus = set(tuple(map(int, target.split("."))) for target in args.focus.split(","))
+
 # Set up signal handler for CTRL+C and signals from child monitor thread
 # since this is the same signal, we use the monitor.crashEvent flag()
 # to differentiate between a CTRL+C and a interrupt_main() call from child 
@@ -438,134 +1003,294 @@ def sigint_handler(signal, frame):
 signal.signal(signal.SIGINT, sigint_handler)
 
 ########## Begin fuzzing
-i = MIN_RUN_NUMBER-1 if fuzzerData.shouldPerformTestRun else MIN_RUN_NUMBER
-failureCount = 0
 loop_len = len(SEED_LOOP) # if --loop
 
-while True:
-    lastMessageCollection = deepcopy(fuzzerData.messageCollection)
-    wasCrashDetected = False
-    print "\n** Sleeping for %.3f seconds **" % args.sleeptime
-    time.sleep(args.sleeptime)
+# Seed used for run number runNumber (not applicable to dumpraw/test run)
+def getSeedForRun(runNumber):
+    if loop_len:
+        return SEED_LOOP[runNumber%loop_len]
+    return runNumber
+
+# Run numbers are shared out between workers, the test run finishes before any fuzzing starts
+# With --processes, only the first process does the test run, and each takes every Nth run number
+testRunNumber = MIN_RUN_NUMBER-1 if fuzzerData.shouldPerformTestRun and processNumber == 0 else None
+campaignClient = None
+if args.coordinator:
+    # Run numbers come from the coordinator instead, one block at a time
+    (coordinatorHost, coordinatorPort) = args.coordinator.rsplit(":", 1)
+    campaignClient = CampaignClient(coordinatorHost, int(coordinatorPort))
+    print "Leasing run numbers from coordinator %s" % (args.coordinator)
+    runAllocator = LeasedRunAllocator(campaignClient, testRunNumber=testRunNumber)
+    if logger:
+        logger.setLogCallback(campaignClient.sendLog)
+else:
+    runAllocator = RunAllocator(MIN_RUN_NUMBER+processNumber, MAX_RUN_NUMBER, testRunNumber=testRunNumber, stride=args.processes)
+
+# Stop the whole session, letting the other processes and the coordinator
+# know with --processes and --coordinator
+def halt():
+    if processCoordinator:
+        processCoordinator.reportHalt()
+    if campaignClient:
+        campaignClient.reportHalt()
+    exit()
+
+# Fuzz until out of run numbers, using worker's copy of the fuzzer data/processors/logger
+# Halting (LogAndHalt etc) exits the thread with SystemExit
+# A generator like performRun(), so workers can share an EventLoop with --async
+def fuzzLoop(worker):
+    fuzzerData = worker.fuzzerData
+    logger = worker.logger
+    messageProcessor = worker.messageProcessor
+    exceptionProcessor = worker.exceptionProcessor
+    # Other workers hold off until the test run is done
+    while not runAllocator.isReady():
+        yield Sleep(0.01)
+    i = runAllocator.getNext()
+    if i is None:
+        return
+    failureCount = 0
+    # Used to tell when the same run number is being repeated after a failure or retry
+    lastRunNumber = None
+    # Last distinct run number this worker ran
+    previousRunNumber = None
+
+    while True:
+        # Only needed to log this case if the next one halts, not with --quiet
+        lastMessageCollection = deepcopy(fuzzerData.messageCollection) if logger else None
+        # Let radamsa processes for this and the next few seeds start up while we sleep/run
+        if args.dumpraw:
+            mutator.prepare([args.dumpraw])
+        elif mutator.wantsUpcomingSeeds:
+            upcomingRuns = filter(lambda runNumber: runNumber >= MIN_RUN_NUMBER, [i] + runAllocator.getUpcoming(RADAMSA_SEEDS_AHEAD * args.workers))
+            upcomingSeeds = map(getSeedForRun, upcomingRuns)
+            if mutationCorpus:
+                # No need to spawn radamsa for seeds that are already pregenerated
+                upcomingSeeds = filter(lambda seed: not mutationCorpus.hasSeed(seed), upcomingSeeds)
+            mutator.prepare(upcomingSeeds)
+        wasCrashDetected = False
+        wasMonitorCrash = False
+        isRepeatRun = i == lastRunNumber
+        if not isRepeatRun:
+            previousRunNumber = lastRunNumber
+        lastRunNumber = i
+        isTestRun = i == MIN_RUN_NUMBER-1 and not args.dumpraw
+        parentSeeds = fixedParentSeeds
+        if scheduler and not isTestRun:
+            parentSeeds = scheduler.startCase(i)
+        focus = fixedFocus
+        if energyScheduler and not isTestRun:
+            focus = energyScheduler.startCase(i)
+        # Name of the exception that ended the case, for the scheduler's fingerprint
+        caseOutcome = None
+        sleepSeconds = args.sleeptime
+        if rateController:
+            sleepSeconds = rateController.startCase()
+            while sleepSeconds is None:
+                yield Sleep(SLOT_POLL_SECONDS)
+                sleepSeconds = rateController.startCase()
+        print "\n** Sleeping for %.3f seconds **" % sleepSeconds
+        yield Sleep(sleepSeconds)
     
-    try:
         try:
-            if args.dumpraw:
-                print "\n\nPerforming single raw dump case: %d" % args.dumpraw
-                performRun(fuzzerData, host, logger, messageProcessor, seed=args.dumpraw)  
-            elif i == MIN_RUN_NUMBER-1:
-                print "\n\nPerforming test run without fuzzing..."
-                performRun(fuzzerData, host, logger, messageProcessor, seed=-1) 
-            elif loop_len: 
-                print "\n\nFuzzing with seed %d" % (SEED_LOOP[i%loop_len])
-                performRun(fuzzerData, host, logger, messageProcessor, seed=SEED_LOOP[i%loop_len]) 
-            else:
-                print "\n\nFuzzing with seed %d" % (i)
-                performRun(fuzzerData, host, logger, messageProcessor, seed=i) 
-            #if --quiet, (logger==None) => AttributeError
-            if logAll:
-                try:
-                    logger.outputLog(i, fuzzerData.messageCollection, "LogAll ")
-                except AttributeError:
-                    pass
+            try:
+                if args.dumpraw:
+                    print "\n\nPerforming single raw dump case: %d" % args.dumpraw
+                    yield performRun(fuzzerData, host, logger, messageProcessor, seed=args.dumpraw, worker=worker)  
+                elif isTestRun:
+                    print "\n\nPerforming test run without fuzzing..."
+                    yield performRun(fuzzerData, host, logger, messageProcessor, seed=-1, worker=worker) 
+                    if latencyModel:
+                        reportLearnedTimeouts()
+                else:
+                    if parentSeeds:
+                        print "\n\nFuzzing with seed %d after parent seeds %s" % (getSeedForRun(i), ",".join(map(str, parentSeeds)))
+                    else:
+                        print "\n\nFuzzing with seed %d" % (getSeedForRun(i))
+                    if focus is not None:
+                        print "Only fuzzing subcomponents %s" % (",".join("%d.%d" % target for target in sorted(focus)))
+                    # Only this worker gets this count, so only one runs each baseline
+                    caseCount = stats.increment("cases")
+                    if caseCount % STATS_INTERVAL == 0:
+                        stats.printReport()
+                    # Measure first if there was no test run to learn from
+                    isUnmeasured = caseCount == 1 and latencyModel and latencyModel.getCaseTimeout() is None
+                    if latencyModel and (caseCount % BASELINE_INTERVAL == 0 or isUnmeasured):
+                        yield performBaselineRun(fuzzerData, messageProcessor, worker)
+                    # Repeats of a crashing/retried case are never duplicates
+                    yield performRun(fuzzerData, host, logger, messageProcessor, seed=getSeedForRun(i), checkDuplicates=not isRepeatRun, parentSeeds=parentSeeds, focus=focus, worker=worker) 
+                #if --quiet, (logger==None) => AttributeError
+                if logAll:
+                    try:
+                        logger.outputLog(i, fuzzerData.messageCollection, "LogAll ")
+                    except AttributeError:
+                        pass
                  
-        except Exception as e:
-            if monitor.crashEvent.isSet():
-                print "Crash event detected"
+            except DuplicateCaseException as e:
+                print "Skipping duplicate case: %s" % (str(e))
+                caseOutcome = e.__class__.__name__
+            except Exception as e:
+                caseOutcome = e.__class__.__name__
+                if monitor.crashEvent.isSet():
+                    print "Crash event detected"
+                    wasMonitorCrash = True
+                    if args.workers > 1:
+                        # Any case running at the time could be the culprit
+                        print "Seeds in flight on other workers: %s" % (", ".join(str(getSeedForRun(runNumber)) for runNumber in runAllocator.getInFlight() if runNumber != i))
+                    try:
+                        logger.outputLog(i, fuzzerData.messageCollection, "Crash event detected")
+                        #exit()
+                    except AttributeError: 
+                        pass
+                    monitor.crashEvent.clear()
+
+                elif logAll:
+                    try:
+                        logger.outputLog(i, fuzzerData.messageCollection, "LogAll ")
+                    except AttributeError:
+                        pass
+            
+                if e.__class__ in MessageProcessorExceptions.all:
+                    # If it's a MessageProcessorException, assume the MP raised it during the run
+                    # Otherwise, let the MP know about the exception
+                    raise e
+                else:
+                    exceptionProcessor.processException(e)
+                    # Will not get here if processException raises another exception
+                    print "Exception ignored: %s" % (str(e))
+        
+        except LogCrashException as e:
+            caseOutcome = e.__class__.__name__
+            if failureCount == 0:
                 try:
-                    logger.outputLog(i, fuzzerData.messageCollection, "Crash event detected")
-                    #exit()
-                except AttributeError: 
-                    pass
-                monitor.crashEvent.clear()
+                    print "MessageProcessor detected a crash"
+                    logger.outputLog(i, fuzzerData.messageCollection, str(e))
+                except AttributeError:  
+                    pass   
 
-            elif logAll:
+            if logAll:
                 try:
                     logger.outputLog(i, fuzzerData.messageCollection, "LogAll ")
                 except AttributeError:
                     pass
-            
-            if e.__class__ in MessageProcessorExceptions.all:
-                # If it's a MessageProcessorException, assume the MP raised it during the run
-                # Otherwise, let the MP know about the exception
-                raise e
-            else:
-                exceptionProcessor.processException(e)
-                # Will not get here if processException raises another exception
-                print "Exception ignored: %s" % (str(e))
-        
-    except LogCrashException as e:
-        if failureCount == 0:
-            try:
-                print "MessageProcessor detected a crash"
-                logger.outputLog(i, fuzzerData.messageCollection, str(e))
-            except AttributeError:  
-                pass   
 
-        if logAll:
-            try:
-                logger.outputLog(i, fuzzerData.messageCollection, "LogAll ")
-            except AttributeError:
-                pass
+            failureCount = failureCount + 1
+            wasCrashDetected = True
 
-        failureCount = failureCount + 1
-        wasCrashDetected = True
-
-    except AbortCurrentRunException as e:
-        # Give up on the run early, but continue to the next test
-        # This means the run didn't produce anything meaningful according to the processor
-        print "Run aborted: %s" % (str(e))
+        except AbortCurrentRunException as e:
+            # Give up on the run early, but continue to the next test
+            # This means the run didn't produce anything meaningful according to the processor
+            print "Run aborted: %s" % (str(e))
+            caseOutcome = e.__class__.__name__
     
-    except RetryCurrentRunException as e:
-        # Same as AbortCurrentRun but retry the current test rather than skipping to next
-        print "Retrying current run: %s" % (str(e))
-        # Slightly sketchy - a continue *should* just go to the top of the while without changing i
-        continue
+        except RetryCurrentRunException as e:
+            # Same as AbortCurrentRun but retry the current test rather than skipping to next
+            print "Retrying current run: %s" % (str(e))
+            if rateController:
+                rateController.finishCase(True)
+            # Slightly sketchy - a continue *should* just go to the top of the while without changing i
+            continue
         
-    except LogAndHaltException as e:
-        if logger:
-            logger.outputLog(i, fuzzerData.messageCollection, str(e))
-            print "Received LogAndHaltException, logging and halting"
-        else:
-            print "Received LogAndHaltException, halting but not logging (quiet mode)"
-        exit()
+        except LogAndHaltException as e:
+            if logger:
+                logger.outputLog(i, fuzzerData.messageCollection, str(e))
+                print "Received LogAndHaltException, logging and halting"
+            else:
+                print "Received LogAndHaltException, halting but not logging (quiet mode)"
+            halt()
         
-    except LogLastAndHaltException as e:
-        if logger:
-            if i > MIN_RUN_NUMBER:
-                print "Received LogLastAndHaltException, logging last run and halting"
-                if MIN_RUN_NUMBER == MAX_RUN_NUMBER:
-                    #in case only 1 case is run
-                    logger.outputLastLog(i, lastMessageCollection, str(e))
-                    print "Logged case %d" % i
+        except LogLastAndHaltException as e:
+            if logger:
+                if i > MIN_RUN_NUMBER:
+                    print "Received LogLastAndHaltException, logging last run and halting"
+                    if MIN_RUN_NUMBER == MAX_RUN_NUMBER:
+                        #in case only 1 case is run
+                        logger.outputLastLog(i, lastMessageCollection, str(e))
+                        print "Logged case %d" % i
+                    else:
+                        # This worker's last run, i-1 unless other workers are running too
+                        logger.outputLastLog(previousRunNumber if previousRunNumber is not None else i-1, lastMessageCollection, str(e))
                 else:
-                    logger.outputLastLog(i-1, lastMessageCollection, str(e))
+                    print "Received LogLastAndHaltException, skipping logging (due to last run being a test run) and halting"
             else:
-                print "Received LogLastAndHaltException, skipping logging (due to last run being a test run) and halting"
-        else:
-            print "Received LogLastAndHaltException, halting but not logging (quiet mode)"
-        exit()
+                print "Received LogLastAndHaltException, halting but not logging (quiet mode)"
+            halt()
 
-    except HaltException as e:
-        print "Received HaltException halting"
-        exit()
+        except HaltException as e:
+            print "Received HaltException halting"
+            halt()
 
-    if wasCrashDetected:
-        if failureCount < fuzzerData.failureThreshold:
-            print "Failure %d of %d allowed for seed %d" % (failureCount, fuzzerData.failureThreshold, i)
-            print "The test run didn't complete, continuing after %d seconds..." % (fuzzerData.failureTimeout)
-            time.sleep(fuzzerData.failureTimeout)
+        if scheduler and caseOutcome != "DuplicateCaseException":
+            seedChain = () if isTestRun else parentSeeds + (getSeedForRun(i),)
+            if scheduler.finishCase(seedChain, caseOutcome):
+                print "New kind of response, keeping case for re-mutation"
+        if energyScheduler and not isTestRun and caseOutcome != "DuplicateCaseException":
+            energyScheduler.finishCase(caseOutcome, wasCrashDetected or wasMonitorCrash)
+        if rateController:
+            rateController.finishCase(caseOutcome not in (None, "DuplicateCaseException"))
+
+        if wasCrashDetected:
+            if failureCount < fuzzerData.failureThreshold:
+                print "Failure %d of %d allowed for seed %d" % (failureCount, fuzzerData.failureThreshold, i)
+                print "The test run didn't complete, continuing after %d seconds..." % (fuzzerData.failureTimeout)
+                yield Sleep(fuzzerData.failureTimeout)
+            else:
+                print "Failed %d times, moving to next test." % (failureCount)
+                failureCount = 0
+                i = runAllocator.getNext(i)
         else:
-            print "Failed %d times, moving to next test." % (failureCount)
-            failureCount = 0
-            i += 1
-    else:
-        i += 1
+            i = runAllocator.getNext(i)
+
+        if isTestRun and i != lastRunNumber and processCoordinator:
+            # The other processes start fuzzing once the test run is over
+            processCoordinator.reportReady()
     
-    # Stop if we have a maximum and have hit it
-    if MAX_RUN_NUMBER >= 0 and i > MAX_RUN_NUMBER:
-        exit()
+        # Stop if we have a maximum and have hit it
+        if i is None:
+            return
 
-    if args.dumpraw:
-        exit()
-        
+        if args.dumpraw:
+            exit()
+
+mainWorker = FuzzWorker(0, fuzzerData, logger, messageProcessor, exceptionProcessor)
+if args.workers == 1:
+    runBlocking(fuzzLoop(mainWorker))
+    exit()
+
+workers = [mainWorker] + [mainWorker.createSibling(workerNumber, procDirector.messageProcessor, procDirector.exceptionProcessor) for workerNumber in range(1, args.workers)]
+if args.isAsync:
+    print "Fuzzing with %d workers on one thread" % (args.workers)
+    eventLoop = EventLoop()
+    for worker in workers:
+        eventLoop.spawn(fuzzLoop(worker))
+    try:
+        eventLoop.run()
+    finally:
+        # Stop conversations cut short by CTRL+C or a halt now, rather than
+        # when Python is tearing down the modules they use
+        eventLoop.close()
+    exit()
+
+print "Fuzzing with %d workers" % (args.workers)
+# Set when any worker halts, stopping the whole session
+haltEvent = threading.Event()
+def runWorker(worker):
+    try:
+        runBlocking(fuzzLoop(worker))
+    except SystemExit:
+        haltEvent.set()
+    except:
+        traceback.print_exc()
+        haltEvent.set()
+
+workerThreads = []
+for worker in workers:
+    workerThread = threading.Thread(target=runWorker, args=(worker,))
+    workerThread.daemon = True
+    workerThread.start()
+    workerThreads.append(workerThread)
+
+# Sleep rather than join() so CTRL+C still gets through
+while not haltEvent.isSet() and any(workerThread.is_alive() for workerThread in workerThreads):
+    time.sleep(0.1)
+exit()
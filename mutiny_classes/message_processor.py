@@ -67,11 +67,24 @@ class MessageProcessorExtraParams(object):
         # transmitted after fuzzing
         self.actualSubcomponents = actualSubcomponents
 
-        # Convenience variable that is literally just all the originalSubcomponents combined
-        self.originalMessage = bytearray().join(self.originalSubcomponents)
-        
-        # Convenience variable that is literally just all the actualSubcomponents combined
-        self.actualMessage = bytearray().join(self.actualSubcomponents)
+        # Joined on first use, as most callbacks never look at them and
+        # messages can be large
+        self._originalMessage = None
+        self._actualMessage = None
+
+    # Convenience variable that is literally just all the originalSubcomponents combined
+    @property
+    def originalMessage(self):
+        if self._originalMessage is None:
+            self._originalMessage = bytearray().join(self.originalSubcomponents)
+        return self._originalMessage
+
+    # Convenience variable that is literally just all the actualSubcomponents combined
+    @property
+    def actualMessage(self):
+        if self._actualMessage is None:
+            self._actualMessage = bytearray().join(self.actualSubcomponents)
+        return self._actualMessage
 
 class MessageProcessor(object):
     def __init__(self):
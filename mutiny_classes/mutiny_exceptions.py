@@ -48,3 +48,13 @@ class MessageProcessorExceptions(object):
 class ConnectionClosedException(Exception):
     pass
 
+# This is raised by the fuzzer when a proto inproc target raises an exception,
+# with the target's traceback as its message
+class InProcessTargetException(Exception):
+    pass
+
+# This is raised by the fuzzer when a case's outbound data has already been sent
+# by an earlier case, and the rest of the case is skipped
+class DuplicateCaseException(Exception):
+    pass
+
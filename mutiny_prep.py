@@ -20,6 +20,7 @@ import argparse
 from backend.fuzzer_types import Message
 from backend.menu_functions import prompt, promptInt, promptString, validateNumberRange
 from backend.fuzzerdata import FuzzerData
+from backend.dictionary import TokenDictionary
 import scapy.all
 
 GREEN = "\033[92m"
@@ -49,6 +50,11 @@ parser.add_argument("-f", "--force",
                     action = "store_true",  
                     default=False) 
 
+parser.add_argument("-n", "--no_dictionary",
+                    help="Don't extract a token dictionary from the messages",
+                    action="store_true",
+                    default=False)
+
 args = parser.parse_args()
 inputFilePath = args.pcap_file
 
@@ -252,6 +258,20 @@ if len(fuzzerData.messageCollection.messages) == 0:
     exit()
 print "Processed input file %s" % (inputFilePath)
 
+############# Extract token dictionary
+# Strings, delimiters, constants and length fields from the whole conversation,
+# for the native mutator to insert and swap around
+if not args.no_dictionary:
+    tokenDictionary = TokenDictionary()
+    for message in fuzzerData.messageCollection.messages:
+        tokenDictionary.addMessage(message.getOriginalMessage())
+    tokenDictionary.getTokens()
+    dictionaryPath = "{0}.dict".format(os.path.splitext(inputFilePath)[0])
+    tokenDictionary.writeToFile(dictionaryPath)
+    # .fuzzer files are written alongside it, so reference it relative to them
+    fuzzerData.dictionaryFile = os.path.basename(dictionaryPath)
+    print "Wrote %d tokens to dictionary %s" % (len(tokenDictionary.tokens), dictionaryPath)
+
 ############# Get fuzzing details 
 # Ask how many times we should repeat a failed test, as in one causing a crash
 fuzzerData.failureThreshold = promptInt("\nHow many times should a test case causing a crash or error be repeated?", defaultResponse=3) if not args.force else 3
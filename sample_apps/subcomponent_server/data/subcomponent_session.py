@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# The subcomponent server's protocol without the socket, for fuzzing with
+# proto inproc (see subcomponent-inproc.fuzzer)
+# Mutiny makes a SubcomponentSession for each case and calls it with each
+# outbound message, what it returns is the server's response
+
+STATES = ("Listening", "Authenticated", "Quit")
+STATE_COMMANDS = ("auth", "echo", "quit")
+
+class SubcomponentSession(object):
+    def __init__(self):
+        self.state = STATES[0]
+
+    def __call__(self, message):
+        data = str(message).rstrip()
+        if self.state == STATES[0]:
+            if data == STATE_COMMANDS[0]:
+                self.state = STATES[1]
+                return "OK\n"
+        elif self.state == STATES[1]:
+            if data[:4] == STATE_COMMANDS[1]:
+                # Like the server, which goes on to reject the command as well
+                return "%s\nINVALID\n" % (data[5:])
+            elif data == STATE_COMMANDS[2]:
+                self.state = STATES[2]
+                return "OK\n"
+        return "INVALID\n"
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# Test leasing run numbers from a coordinator over localhost, including
+# taking blocks back from a lost worker and collecting logs
+#
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+#------------------------------------------------------------------
+
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+sys.path.append("../..")
+from backend.campaign import SeedLeaser, CampaignServer, CampaignClient, LeasedRunAllocator
+
+class Color:
+   GREEN = '\033[92m'
+   RED = '\033[91m'
+   END = '\033[0m'
+
+def printResult(message, isPass):
+    if isPass:
+        resultStr = "Pass"
+        resultColor = Color.GREEN
+    else:
+        resultStr = "Fail"
+        resultColor = Color.RED
+
+    print("\n{}: {}{}{}\n".format(message, resultColor, resultStr, Color.END))
+
+# The server notices a lost worker on its own thread
+def waitFor(condition):
+    for _ in range(0, 50):
+        if condition():
+            return True
+        time.sleep(0.1)
+    return False
+
+def main():
+    logFolderPath = tempfile.mkdtemp()
+    leaser = SeedLeaser(0, 29, blockSize=10)
+    server = CampaignServer(0, leaser, logFolderPath)
+    port = server.server_address[1]
+    serverThread = threading.Thread(target=server.serve_forever)
+    serverThread.daemon = True
+    serverThread.start()
+
+    try:
+        lostClient = CampaignClient("127.0.0.1", port)
+        client = CampaignClient("127.0.0.1", port)
+        printResult("Lease Test", lostClient.lease() == (0, 9) and client.lease() == (10, 19))
+
+        # A worker dropping its connection gives its blocks back before new ones are leased
+        lostClient.close()
+        printResult("Lost Worker Test", waitFor(lambda: leaser.returnedCount == 1) and client.lease() == (0, 9))
+
+        logPath = os.path.join(logFolderPath, "local")
+        with open(logPath, "w") as logFile:
+            logFile.write("Log from run with seed 5\n\x00\xff")
+        client.sendLog(5, logPath)
+        with open(os.path.join(logFolderPath, "5")) as logFile:
+            printResult("Log Collection Test", logFile.read() == "Log from run with seed 5\n\x00\xff")
+
+        # Log names are only ever run numbers, nothing else is written
+        rawConnection = socket.create_connection(("127.0.0.1", port))
+        rawConnection.sendall("log ../escaped 3\nabc")
+        reply = rawConnection.makefile("rb").readline()
+        rawConnection.close()
+        printResult("Log Name Test", reply.startswith("error") and not os.path.exists(os.path.join(logFolderPath, "..", "escaped")))
+        printResult("Loopback Bind Test", server.server_address[0] == "127.0.0.1")
+
+        client.finish(0)
+        client.finish(10)
+        # The allocator runs the test run, then the rest of the range, finishing each block
+        allocator = LeasedRunAllocator(client, testRunNumber=-1)
+        runNumbers = []
+        runNumber = allocator.getNext()
+        while runNumber is not None:
+            runNumbers.append(runNumber)
+            runNumber = allocator.getNext(runNumber)
+        printResult("Allocator Test", runNumbers == [-1] + range(20, 30))
+        printResult("Done Test", leaser.isDone() and leaser.finishedCount == 3)
+        client.close()
+    finally:
+        server.shutdown()
+        shutil.rmtree(logFolderPath)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# Test sending and receiving more than fits in the socket buffers at
+# once, with both the blocking driver and the event loop
+#
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+#------------------------------------------------------------------
+
+import socket
+import sys
+import threading
+import time
+sys.path.append("../..")
+from backend.driver import Return, Connect, Send, ReceiveInto, runBlocking, EventLoop
+from backend.connections import ConnectionFactory
+
+# Far more than a socketpair buffers, so send() only takes part of it at a time
+DATA_SIZE = 8 * 1024 * 1024
+
+class Color:
+   GREEN = '\033[92m'
+   RED = '\033[91m'
+   END = '\033[0m'
+
+def printResult(message, isPass):
+    if isPass:
+        resultStr = "Pass"
+        resultColor = Color.GREEN
+    else:
+        resultStr = "Fail"
+        resultColor = Color.RED
+
+    print("\n{}: {}{}{}\n".format(message, resultColor, resultStr, Color.END))
+
+# Read everything from connection slowly, into received
+def readSlowly(connection, received):
+    time.sleep(0.2)
+    while True:
+        data = connection.recv(65536)
+        if not data:
+            return
+        received.extend(data)
+
+def sendAll(connection, data):
+    yield Send(connection, data, None, 10)
+    connection.close()
+
+# Reads into the first half of buffer only, returns what arrived
+def receiveHalf(connection, buffer, size):
+    view = memoryview(buffer)[:len(buffer) / 2]
+    receivedCount = yield ReceiveInto(connection, view, size, 10, 0.5)
+    raise Return(bytearray(view[:receivedCount]))
+
+def testSend(run):
+    (sender, receiver) = socket.socketpair()
+    data = bytearray(i % 251 for i in range(0, DATA_SIZE))
+    received = bytearray()
+    reader = threading.Thread(target=readSlowly, args=(receiver, received))
+    reader.start()
+    run(sendAll(sender, data))
+    reader.join()
+    receiver.close()
+    return received == data
+
+def testReceive(run):
+    (sender, receiver) = socket.socketpair()
+    sender.sendall("x" * 100)
+    buffer = bytearray(128)
+    response = run(receiveHalf(receiver, buffer, 100))
+    sender.close()
+    receiver.close()
+    # Stops at the end of the view even though more was expected
+    return response == bytearray("x" * 64) and buffer[64:] == bytearray(64)
+
+def connect(connection, addr):
+    yield Connect(connection, addr)
+
+# Finishing a connect that was started ahead of time, whether or not it's
+# done yet, leaves a connected socket
+def testPreconnect(run):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(4)
+    factory = ConnectionFactory("localhost", listener.getsockname()[1], socket.SOCK_STREAM)
+    isConnected = True
+    for delay in (0, 0.1):
+        connection = factory.startConnecting()
+        time.sleep(delay)
+        run(connect(connection, factory.addr))
+        (accepted, _) = listener.accept()
+        connection.setblocking(1)
+        connection.sendall("ping")
+        isConnected = isConnected and accepted.recv(4) == "ping"
+        accepted.close()
+        connection.close()
+    listener.close()
+    return isConnected
+
+def runOnEventLoop(generator):
+    result = []
+    def wrapper():
+        result.append((yield generator))
+    eventLoop = EventLoop()
+    eventLoop.spawn(wrapper())
+    eventLoop.run()
+    return result[0]
+
+def main():
+    printResult("Blocking Partial Send Test", testSend(runBlocking))
+    printResult("Event Loop Partial Send Test", testSend(runOnEventLoop))
+    printResult("Blocking Receive Into View Test", testReceive(runBlocking))
+    printResult("Event Loop Receive Into View Test", testReceive(runOnEventLoop))
+    printResult("Blocking Pre-connected Test", testPreconnect(runBlocking))
+    printResult("Event Loop Pre-connected Test", testPreconnect(runOnEventLoop))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# Test token dictionary extraction and dictionary-aware mutation
+#
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+#------------------------------------------------------------------
+
+import os
+import struct
+import sys
+import tempfile
+sys.path.append("../..")
+from backend.dictionary import TokenDictionary
+from backend.mutators import NativeMutator
+
+# Sample seed string for fuzzing, same as mutator_test.py
+START_STRING = "GET /test1234 HTTP/1.1\r\nFrom: joebob@test.com\r\nUser-Agent: Mozilla/1.2\r\n\r\n"
+# Binary messages sharing a magic constant, each with a big-endian length of the rest
+BINARY_MESSAGES = [struct.pack(">IH", 0xcafef00d, 10) + "\x01" * 10,
+                   struct.pack(">IH", 0xcafef00d, 12) + "\x02" * 12]
+
+class Color:
+   GREEN = '\033[92m'
+   RED = '\033[91m'
+   END = '\033[0m'
+
+def printResult(message, isPass):
+    if isPass:
+        resultStr = "Pass"
+        resultColor = Color.GREEN
+    else:
+        resultStr = "Fail"
+        resultColor = Color.RED
+    
+    print("\n{}: {}{}{}\n".format(message, resultColor, resultStr, Color.END))
+
+def main():
+    dictionary = TokenDictionary()
+    for message in [START_STRING, "HTTP/1.1 200 OK\r\n\r\n"] + BINARY_MESSAGES:
+        dictionary.addMessage(message)
+    tokens = [str(token) for token in dictionary.getTokens()]
+
+    printResult("Printable String Test", "User-Agent" in tokens and "joebob@test.com" in tokens)
+    printResult("Delimiter Test", "\r\n" in tokens and "\r\n\r\n" in tokens)
+    printResult("Constant Test", "\xca\xfe\xf0\x0d" in tokens)
+    printResult("Length Field Test", "\x00\x0a" in tokens and "\x00\x0c" in tokens)
+
+    # Written and read back unchanged, including unprintable bytes
+    (fd, filePath) = tempfile.mkstemp(suffix=".dict")
+    os.close(fd)
+    dictionary.writeToFile(filePath)
+    readTokens = [str(token) for token in TokenDictionary().readFromFile(filePath)]
+    os.remove(filePath)
+    printResult("Serialization Test", readTokens == tokens)
+
+    # Tokens make it into the output, and outputs are still deterministic
+    mutator = NativeMutator(dictionary=["MAGICTOKEN"])
+    hasToken = False
+    isDeterministic = True
+    for seed in range(0, 1000):
+        output = mutator.mutate(START_STRING, seed)
+        if "MAGICTOKEN" in output:
+            hasToken = True
+        if output != mutator.mutate(START_STRING, seed):
+            isDeterministic = False
+    printResult("Token Insertion Test", hasToken)
+    printResult("Deterministic Per Seed Test", isDeterministic)
+
+    # No dictionary must mean no change to plain native mutator output
+    plainMutator = NativeMutator()
+    emptyMutator = NativeMutator(dictionary=[])
+    printResult("Empty Dictionary Test", all(plainMutator.mutate(START_STRING, seed) == emptyMutator.mutate(START_STRING, seed) for seed in range(0, 1000)))
+
+if __name__ == "__main__":
+    main()
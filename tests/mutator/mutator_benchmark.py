@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# Benchmark mutation backends for throughput and output quality
+#
+# For each backend and input size, reports cases/sec, p50/p99 latency
+# per mutation, output size distribution, uniqueness ratio (the same
+# measure mutator_test.py tracks), and CPU time per case including any
+# child processes.  Results are written as JSON so runs before and
+# after a mutator change can be compared.
+#
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+#------------------------------------------------------------------
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(__file__, "../../..")))
+from backend.mutators import NativeMutator
+from backend.radamsa import RadamsaPool
+
+# Sample seed string for fuzzing, same as mutator_test.py
+START_STRING = "GET /test1234 HTTP/1.1\r\nFrom: joebob@test.com\r\nUser-Agent: Mozilla/1.2\r\n\r\n"
+
+# Some other defines taken from mutiny.py
+RADAMSA=os.path.abspath( os.path.join(__file__, "../../../radamsa-0.3/bin/radamsa") )
+
+# Build an input of roughly the given size: the HTTP sample followed by
+# a mix of text and binary, generated the same way every time
+def makeInput(size):
+    rng = random.Random(size)
+    data = bytearray(START_STRING)
+    while len(data) < size:
+        if rng.randrange(2):
+            data += START_STRING
+        else:
+            data += bytearray(rng.getrandbits(8) for _ in xrange(256))
+    return data[:size] if size >= len(START_STRING) else data
+
+# (name, input, fraction of --iterations to run) - big inputs run fewer cases
+INPUTS = [
+    ("http-80B", bytearray(START_STRING), 1.0),
+    ("4KB", makeInput(4 * 1024), 1.0),
+    ("64KB", makeInput(64 * 1024), 0.1),
+    ("2MB", makeInput(2 * 1024 * 1024), 0.01),
+]
+
+def percentile(sortedValues, fraction):
+    if not sortedValues:
+        return 0
+    return sortedValues[min(len(sortedValues) - 1, int(fraction * len(sortedValues)))]
+
+def getCpuTime():
+    # Include child processes so radamsa's own CPU time is counted
+    times = os.times()
+    return times[0] + times[1] + times[2] + times[3]
+
+def benchmark(mutator, fuzzerInput, iterations):
+    latencies = []
+    outputSizes = []
+    outputHashes = set()
+
+    cpuStart = getCpuTime()
+    wallStart = time.time()
+    for seed in xrange(0, iterations):
+        # Let pre-spawning mutators work ahead the same way mutiny.py does
+        mutator.prepare(range(seed, seed + 4))
+        start = time.time()
+        output = mutator.mutate(fuzzerInput, seed)
+        latencies.append(time.time() - start)
+        outputSizes.append(len(output))
+        outputHashes.add(hashlib.md5(output).digest())
+    wallTime = time.time() - wallStart
+    cpuTime = getCpuTime() - cpuStart
+
+    latencies.sort()
+    outputSizes.sort()
+    return {
+        "iterations": iterations,
+        "inputSize": len(fuzzerInput),
+        "casesPerSecond": iterations / wallTime if wallTime > 0 else 0.0,
+        "latencyP50": percentile(latencies, 0.50),
+        "latencyP99": percentile(latencies, 0.99),
+        "outputSize": {
+            "min": outputSizes[0],
+            "p50": percentile(outputSizes, 0.50),
+            "p90": percentile(outputSizes, 0.90),
+            "p99": percentile(outputSizes, 0.99),
+            "max": outputSizes[-1],
+            "mean": float(sum(outputSizes)) / len(outputSizes),
+        },
+        "uniqueRatio": float(len(outputHashes)) / iterations,
+        "cpuPerCase": cpuTime / iterations,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mutiny mutation backends")
+    parser.add_argument("-b", "--backend", help="Backend to benchmark, can be given more than once (default: all)", action="append", choices=["radamsa", "native"])
+    parser.add_argument("-n", "--iterations", help="Cases per backend for small inputs (default: 1000)", type=int, default=1000)
+    parser.add_argument("-o", "--output", help="JSON results file (default: mutator_benchmark.json)", default="mutator_benchmark.json")
+    args = parser.parse_args()
+
+    backends = args.backend or ["radamsa", "native"]
+    if "radamsa" in backends and not os.path.exists(RADAMSA):
+        sys.exit("Could not find radamsa in %s... did you build it?" % RADAMSA)
+
+    results = {"timestamp": time.time(), "backends": {}}
+    for backend in backends:
+        results["backends"][backend] = {}
+        for (inputName, fuzzerInput, iterationFraction) in INPUTS:
+            if backend == "radamsa":
+                mutator = RadamsaPool(RADAMSA)
+            else:
+                mutator = NativeMutator(spliceSources=[START_STRING])
+            iterations = max(10, int(args.iterations * iterationFraction))
+            try:
+                result = benchmark(mutator, fuzzerInput, iterations)
+            finally:
+                mutator.close()
+            results["backends"][backend][inputName] = result
+            print("{0:8} {1:9} {2:10.1f} cases/sec  p50 {3:8.3f}ms  p99 {4:8.3f}ms  unique {5:6.1%}  cpu/case {6:8.3f}ms  median size {7}".format(
+                backend, inputName, result["casesPerSecond"], result["latencyP50"] * 1000, result["latencyP99"] * 1000,
+                result["uniqueRatio"], result["cpuPerCase"] * 1000, result["outputSize"]["p50"]))
+
+    with open(args.output, "w") as outputFile:
+        json.dump(results, outputFile, indent=2, sort_keys=True)
+    print("Wrote results to {0}".format(args.output))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# Test the native mutator, verify it is deterministic per seed and
+# handles every input type and size it may be given
+#
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+#------------------------------------------------------------------
+
+import sys
+sys.path.append("../..")
+from backend.mutators import NativeMutator
+
+# Sample seed string for fuzzing, same as mutator_test.py
+START_STRING = "GET /test1234 HTTP/1.1\r\nFrom: joebob@test.com\r\nUser-Agent: Mozilla/1.2\r\n\r\n"
+ITERATIONS = 5000
+
+class Color:
+   GREEN = '\033[92m'
+   RED = '\033[91m'
+   END = '\033[0m'
+
+def printResult(message, isPass):
+    if isPass:
+        resultStr = "Pass"
+        resultColor = Color.GREEN
+    else:
+        resultStr = "Fail"
+        resultColor = Color.RED
+    
+    print("\n{}: {}{}{}\n".format(message, resultColor, resultStr, Color.END))
+
+def main():
+    mutator = NativeMutator(spliceSources=["OK\n", START_STRING])
+    otherMutator = NativeMutator(spliceSources=["OK\n", START_STRING])
+    original = bytearray(START_STRING)
+    
+    # Same seed must always give the same output, even from a separate instance
+    isDeterministic = True
+    outputs = set()
+    for seed in range(0, ITERATIONS):
+        output = mutator.mutate(original, seed)
+        if output != otherMutator.mutate(original, seed) or output != mutator.mutate(original, seed):
+            print("Seed {0} produced different outputs".format(seed))
+            isDeterministic = False
+        outputs.add(str(output))
+    printResult("Deterministic Per Seed Test", isDeterministic)
+    
+    print("{0} unique outputs from {1} seeds".format(len(outputs), ITERATIONS))
+    printResult("Uniqueness Test", len(outputs) > ITERATIONS * 0.9)
+
+    printResult("Input Unmodified Test", original == bytearray(START_STRING))
+
+    # str, bytearray, and memoryview inputs are all interchangeable
+    isTypeIndependent = True
+    for seed in range(0, 100):
+        expected = mutator.mutate(original, seed)
+        if mutator.mutate(START_STRING, seed) != expected or mutator.mutate(memoryview(START_STRING), seed) != expected:
+            isTypeIndependent = False
+    printResult("Input Type Test", isTypeIndependent)
+
+    # Tiny inputs shouldn't trip up any of the mutations
+    try:
+        for seed in range(0, ITERATIONS):
+            mutator.mutate("", seed)
+            mutator.mutate("A", seed)
+        isPass = True
+    except Exception as e:
+        print("Caught exception running test: {}".format(str(e)))
+        isPass = False
+    printResult("Small Input Test", isPass)
+
+    # A size limit only cuts off the end, it doesn't change the mutation
+    isLimited = True
+    for seed in range(0, 1000):
+        expected = mutator.mutate(original, seed)
+        if mutator.mutate(original, seed, 16) != expected[:16]:
+            isLimited = False
+    printResult("Size Limit Test", isLimited)
+
+if __name__ == "__main__":
+    main()
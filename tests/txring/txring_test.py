@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+#------------------------------------------------------------------
+# Test that frames sent through a PACKET_TX_RING on loopback arrive with
+# the bytes they were sent with, even when they're only read after later
+# frames have reused their ring slots
+# Needs Linux and root (AF_PACKET sockets)
+#
+# Copyright (c) 2014-2017 by Cisco Systems, Inc.
+# All rights reserved.
+#
+#------------------------------------------------------------------
+
+import socket
+import sys
+sys.path.append("../..")
+from backend.txring import PacketTxRing
+
+# Local experimental ethertype, nothing else on lo uses it
+ETHERTYPE = 0x88b5
+INTERFACE = "lo"
+
+class Color:
+   GREEN = '\033[92m'
+   RED = '\033[91m'
+   END = '\033[0m'
+
+def printResult(message, isPass):
+    if isPass:
+        resultStr = "Pass"
+        resultColor = Color.GREEN
+    else:
+        resultStr = "Fail"
+        resultColor = Color.RED
+
+    print("\n{}: {}{}{}\n".format(message, resultColor, resultStr, Color.END))
+
+def makeFrame(frameNumber):
+    header = "\x00" * 12 + chr(ETHERTYPE >> 8) + chr(ETHERTYPE & 0xff)
+    return bytearray((header + "payload%d" % (frameNumber)).ljust(60, "\x00"))
+
+# Sends frameCount frames through a ring with batchSize, then reads them
+# all back, returns whether each arrived intact and in order
+def testFrames(batchSize, frameCount):
+    receiver = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETHERTYPE))
+    receiver.bind((INTERFACE, ETHERTYPE))
+    receiver.settimeout(1)
+    sender = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+    sender.bind((INTERFACE, 0))
+    ring = PacketTxRing(sender, INTERFACE, batchSize)
+    frames = [makeFrame(frameNumber) for frameNumber in range(0, frameCount)]
+    for frame in frames:
+        ring.sendto(frame, None)
+    ring.flush(isWait=True)
+    received = []
+    try:
+        while len(received) < frameCount:
+            (data, addr) = receiver.recvfrom(2048)
+            # Loopback shows the receiver each frame going out as well as coming in
+            if addr[2] != socket.PACKET_OUTGOING:
+                received.append(bytearray(data))
+    except socket.timeout:
+        pass
+    ring.close()
+    receiver.close()
+    return received == frames
+
+def main():
+    if not hasattr(socket, "AF_PACKET"):
+        print "Skipping, needs Linux AF_PACKET sockets"
+        return
+    try:
+        socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0).close()
+    except socket.error:
+        print "Skipping, needs root for AF_PACKET sockets"
+        return
+    printResult("Batch 1 Frame Contents Test", testFrames(1, 10))
+    printResult("Batch 4 Frame Contents Test", testFrames(4, 20))
+    printResult("Batch 16 Frame Contents Test", testFrames(16, 100))
+
+if __name__ == "__main__":
+    main()